@@ -0,0 +1,111 @@
+# ml_service/batching.py
+import threading
+import time
+
+import numpy as np
+
+
+class _Batch:
+    __slots__ = ("inputs", "rows", "full", "done", "outputs", "error", "opened")
+
+    def __init__(self):
+        self.inputs = []
+        self.rows = 0
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.outputs = None
+        self.error = None
+        self.opened = time.perf_counter()
+
+
+class InferenceBatcher:
+    """Coalesces concurrent inference calls on one model into a single vectorized call.
+
+    Analysis sections call ``run(key, fn, X)`` from worker threads; ``key``
+    identifies the model (and anything else ``fn`` depends on). The first
+    caller for a key opens a batch and waits up to ``max_wait`` seconds for
+    others to join, or until ``max_batch`` rows are queued; it then runs
+    ``fn`` once on the stacked rows and hands every caller its own slice.
+    The leader only waits when ``should_wait()`` says other work is in
+    flight, so a lone request pays no batching delay. ``observe(model,
+    calls, rows, waits)`` is told about every batch for metrics.
+    Batches form within one process (thread-mode analysis executor).
+    """
+
+    def __init__(self, max_batch=4096, max_wait=0.002, should_wait=None, observe=None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.should_wait = should_wait
+        self.observe = observe
+        self._open = {}
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._calls = 0
+        self._rows = 0
+
+    @property
+    def enabled(self):
+        return self.max_wait > 0 and self.max_batch > 1
+
+    def run(self, key, fn, X):
+        """``fn(X)`` computed as part of a batch; ``fn`` must map rows to rows"""
+        if not self.enabled:
+            return fn(X)
+        arrived = time.perf_counter()
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None or batch.rows + len(X) > self.max_batch
+            if leader:
+                batch = self._open[key] = _Batch()
+            slot = len(batch.inputs)
+            batch.inputs.append((X, arrived))
+            batch.rows += len(X)
+            if batch.rows >= self.max_batch:
+                batch.full.set()
+
+        if leader:
+            if self.should_wait is None or self.should_wait():
+                batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            self._execute(key, fn, batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.outputs[slot]
+
+    def _execute(self, key, fn, batch):
+        # Nobody can join any more: the batch is out of self._open
+        started = time.perf_counter()
+        inputs = [X for X, _ in batch.inputs]
+        try:
+            if len(inputs) == 1:
+                batch.outputs = [fn(inputs[0])]
+            else:
+                output = fn(np.concatenate(inputs))
+                batch.outputs = np.split(output, np.cumsum([len(X) for X in inputs])[:-1])
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+        with self._lock:
+            self._batches += 1
+            self._calls += len(inputs)
+            self._rows += batch.rows
+        if self.observe is not None:
+            self.observe(key[0], len(inputs), batch.rows, [started - arrived for _, arrived in batch.inputs])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_batch": self.max_batch,
+                "max_wait_seconds": self.max_wait,
+                "batches": self._batches,
+                "calls": self._calls,
+                "rows": self._rows,
+                "calls_per_batch": self._calls / self._batches if self._batches else 0.0,
+            }
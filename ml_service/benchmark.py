@@ -0,0 +1,270 @@
+# ml_service/benchmark.py
+"""Reproducible in-process benchmarks for the ML service.
+
+    python benchmark.py --scale medium --save-baseline bench_medium.json
+    python benchmark.py --scale medium --compare bench_medium.json
+    python benchmark.py --scale large --loans 200000 --training-tradeoff 5000 20000 50000
+
+Each analyzer and the full /api/ml/analyze path are timed on a synthetic
+rice-mill workload; latency percentiles, peak traced memory and row
+throughput are reported. With --compare, any benchmark whose median is
+more than --threshold slower than the baseline is flagged and the exit
+status is 1. With --training-tradeoff, the credit model is also trained at
+each loan budget and fit time is reported against full-set accuracy.
+With --credit-engines, it is trained once per engine to compare fit time,
+model size and accuracy.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+# Keep benchmark runs away from the real model store and result cache
+os.environ.setdefault("ML_MODEL_DIR", tempfile.mkdtemp(prefix="ml-bench-models-"))
+os.environ.setdefault("ML_RESULT_CACHE_SIZE", "0")
+os.environ.setdefault("ML_RESULT_CACHE_DIR", "")
+
+import main  # noqa: E402
+import synthetic  # noqa: E402
+from credit_engine import ENGINES, CreditEngine  # noqa: E402
+from sales_table import SalesTable  # noqa: E402
+from sampling import SamplingPolicy  # noqa: E402
+
+
+def build_benchmarks(data, loop):
+    """Name -> (callable, rows processed per call)"""
+    frame = data["sales_frame"]
+    payload = synthetic.ml_request_payload(data)
+    request = main.MLRequest.model_validate(payload)
+    inventory, loans, workers = request.inventory, request.loans, request.workers
+
+    def table():
+        # A fresh table per call so cached daily totals do not leak between runs
+        return SalesTable(frame=frame)
+
+    def full_analyze():
+        started = time.perf_counter()
+        parsed = main.MLRequest.model_validate(payload)
+        response = loop.run_until_complete(main.run_analysis(
+            parsed, SalesTable.of(parsed.sales), validation_seconds=time.perf_counter() - started
+        ))
+        if not response.success:
+            raise RuntimeError(response.message)
+
+    return {
+        "sales_table_build": (lambda: SalesTable.of(request.sales).frame, len(frame)),
+        "sales_forecaster": (lambda: main.SalesForecaster().predict(table()), len(frame)),
+        "stock_risk_predictor": (lambda: main.run_stock_predictions(table(), inventory), len(frame)),
+        "credit_risk_analyzer": (lambda: main.CreditRiskAnalyzer().analyze_risk(loans, table()), len(loans)),
+        "operational_analyzer": (lambda: main.operational_analyzer.analyze_efficiency(workers, table()), len(workers)),
+        "full_analyze": (full_analyze, len(frame)),
+    }
+
+
+def training_tradeoff(data, budgets):
+    """Credit model fit time and full-set accuracy per training-set size (0 = all loans)"""
+    request = main.MLRequest.model_validate({"loans": data["loans"]})
+    sales = SalesTable(frame=data["sales_frame"])
+    sales.customer_index()
+    rows = []
+    default = main.training_sampling
+    try:
+        for budget in budgets:
+            main.training_sampling = SamplingPolicy(max_loans=budget)
+            model = main.CreditRiskAnalyzer()
+            started = time.perf_counter()
+            if not model.train(request.loans, sales):
+                continue
+            rows.append({
+                "max_loans": budget,
+                "rows_used": model.metrics["samples"],
+                "train_seconds": time.perf_counter() - started,
+                "accuracy": model.metrics["accuracy"],
+            })
+    finally:
+        main.training_sampling = default
+    return rows
+
+
+def engine_comparison(data, engines):
+    """Credit model fit time, size and full-set accuracy per credit engine"""
+    request = main.MLRequest.model_validate({"loans": data["loans"]})
+    sales = SalesTable(frame=data["sales_frame"])
+    sales.customer_index()
+    rows = []
+    default = main.credit_engine
+    try:
+        for kind in engines:
+            main.credit_engine = CreditEngine(kind=kind, n_jobs=default.n_jobs)
+            model = main.CreditRiskAnalyzer()
+            started = time.perf_counter()
+            if not model.train(request.loans, sales):
+                continue
+            rows.append({
+                "engine": kind,
+                "train_seconds": time.perf_counter() - started,
+                "fit_seconds": model.metrics["engine"]["fit_seconds"],
+                "model_bytes": model.metrics["engine"]["model_bytes"],
+                "accuracy": model.metrics["accuracy"],
+            })
+    finally:
+        main.credit_engine = default
+    return rows
+
+
+def measure(fn, rows, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    # Memory is traced in a separate run so tracing overhead does not skew timings
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = np.array(timings) * 1000
+    return {
+        "runs": repeat,
+        "min_ms": float(ms.min()),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "peak_mb": peak / 1e6,
+        "rows_per_second": rows / (np.median(timings) or float("inf")),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Rows of (name, baseline p50, current p50, ratio, regressed)"""
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        ratio = current["p50_ms"] / max(previous["p50_ms"], 1e-9)
+        rows.append((name, previous["p50_ms"], current["p50_ms"], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def print_results(results):
+    print(f"{'benchmark':<24}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'peak MB':>10}{'rows/s':>14}")
+    for name, r in results.items():
+        print(
+            f"{name:<24}{r['p50_ms']:>11.2f}{r['p95_ms']:>11.2f}{r['p99_ms']:>11.2f}"
+            f"{r['peak_mb']:>10.1f}{r['rows_per_second']:>14,.0f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Rice Mill ML service")
+    parser.add_argument("--scale", choices=sorted(synthetic.SCALES), default="small")
+    parser.add_argument("--sales", type=int, help="override number of sales rows")
+    parser.add_argument("--skus", type=int, help="override number of SKUs")
+    parser.add_argument("--customers", type=int, help="override number of customers")
+    parser.add_argument("--loans", type=int, help="override number of loans")
+    parser.add_argument("--workers", type=int, help="override number of workers")
+    parser.add_argument("--days", type=int, help="override length of sales history in days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--save-baseline", help="write the JSON report as a baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed median slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--training-tradeoff", type=int, nargs="+", metavar="MAX_LOANS",
+                        help="also train the credit model at these loan budgets (0 = all)")
+    parser.add_argument("--credit-engines", nargs="+", choices=ENGINES, metavar="ENGINE",
+                        help="also train the credit model with these engines")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    data = synthetic.workload(
+        args.scale, seed=args.seed, sales=args.sales, skus=args.skus,
+        customers=args.customers, loans=args.loans, workers=args.workers, days=args.days
+    )
+    print(f"Workload {args.scale} {data['params']} generated in {time.perf_counter() - started:.1f}s")
+
+    loop = asyncio.new_event_loop()
+    try:
+        benchmarks = build_benchmarks(data, loop)
+        results = {}
+        for name, (fn, rows) in benchmarks.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(fn, rows, args.repeat)
+            print(f"  {name}: p50 {results[name]['p50_ms']:.2f} ms")
+    finally:
+        main.analysis_executor.shutdown()
+        loop.close()
+
+    report = {
+        "meta": {
+            "scale": args.scale,
+            "params": data["params"],
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+            "executor_mode": main.analysis_executor.mode,
+            "timestamp": datetime.now().isoformat(),
+        },
+        "results": results,
+    }
+    print_results(results)
+
+    if args.training_tradeoff:
+        report["training_tradeoff"] = training_tradeoff(data, args.training_tradeoff)
+        print(f"\n{'max loans':>10}{'rows used':>11}{'train s':>10}{'accuracy':>10}")
+        for row in report["training_tradeoff"]:
+            print(f"{row['max_loans']:>10}{row['rows_used']:>11}{row['train_seconds']:>10.2f}{row['accuracy']:>10.4f}")
+
+    if args.credit_engines:
+        report["credit_engines"] = engine_comparison(data, args.credit_engines)
+        print(f"\n{'engine':>24}{'train s':>10}{'model KB':>10}{'accuracy':>10}")
+        for row in report["credit_engines"]:
+            print(f"{row['engine']:>24}{row['train_seconds']:>10.2f}{row['model_bytes'] / 1024:>10.0f}{row['accuracy']:>10.4f}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("params") != data["params"]:
+            print("Warning: baseline was recorded with a different workload")
+        regressions = 0
+        print(f"\n{'benchmark':<24}{'baseline ms':>13}{'current ms':>13}{'ratio':>8}")
+        for name, before, after, ratio, regressed in compare(results, baseline, args.threshold):
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<24}{before:>13.2f}{after:>13.2f}{ratio:>8.2f}{flag}")
+        if regressions:
+            print(f"{regressions} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,171 @@
+# ml_service/compression.py
+import threading
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip is offered without it
+    brotli = None
+
+
+def available_encodings():
+    """Encodings this server can produce, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding, available):
+    """The ``available`` encoding the client ranks highest by q-value (ties go to server order), or None"""
+    ranks = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranks[name] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = ranks.get(encoding, ranks.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder"""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == "br":
+            self._encoder = brotli.Compressor(quality=brotli_quality)
+            self._process, self._flush, self._finish = (
+                self._encoder.process, self._encoder.flush, self._encoder.finish
+            )
+        else:
+            self._encoder = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+            self._process = self._encoder.compress
+            self._flush = lambda: self._encoder.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._encoder.flush
+
+    def chunk(self, data):
+        """Compressed ``data``, flushed so the client can decode it right away"""
+        return self._process(data) + self._flush()
+
+    def last(self, data):
+        return self._process(data) + self._finish()
+
+
+class CompressionStats:
+    """Bytes before and after compression per encoding, for the metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}  # encoding -> [responses, raw bytes, sent bytes]
+
+    def record(self, encoding, raw, sent):
+        with self._lock:
+            totals = self._totals.setdefault(encoding, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += raw
+            totals[2] += sent
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for encoding, (responses, raw, sent) in sorted(self._totals.items()):
+                stats[f"{encoding}_responses"] = responses
+                stats[f"{encoding}_raw_bytes"] = raw
+                stats[f"{encoding}_sent_bytes"] = sent
+                stats[f"{encoding}_ratio"] = sent / raw if raw else 1.0
+            return stats
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing responses with the encoding each client prefers.
+
+    Offers brotli (when the ``brotli`` package is installed) and gzip, chosen
+    from the request's Accept-Encoding q-values. Bodies under
+    ``minimum_size`` bytes and responses that already carry a
+    Content-Encoding are sent as they are. Whole bodies of at least
+    ``offload_size`` bytes are compressed on the thread pool, so one large
+    analysis response does not stall the event loop; streamed bodies are
+    compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4,
+                 offload_size=256 * 1024, stats=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.offload_size = offload_size
+        self.stats = stats
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.minimum_size <= 0:
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        state = {"start": None, "compressor": None, "raw": 0, "sent": 0}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            start, body = state["start"], message.get("body", b"")
+            more = message.get("more_body", False)
+            if start is not None:
+                # First body message: decide whether this response is compressed
+                state["start"] = None
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if "content-encoding" in headers or (not more and len(body) < self.minimum_size):
+                    await send(start)
+                    return await send(message)
+                state["compressor"] = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                if more:
+                    del headers["Content-Length"]
+                else:
+                    compressed = await self._compress_whole(state["compressor"], body)
+                    headers["Content-Length"] = str(len(compressed))
+                    self._record(encoding, len(body), len(compressed))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": compressed})
+                await send(start)
+
+            compressor = state["compressor"]
+            if compressor is None:
+                return await send(message)
+            data = compressor.chunk(body) if more else compressor.last(body)
+            state["raw"] += len(body)
+            state["sent"] += len(data)
+            if not more:
+                self._record(encoding, state["raw"], state["sent"])
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _compress_whole(self, compressor, body):
+        if len(body) >= self.offload_size:
+            return await run_in_threadpool(compressor.last, body)
+        return compressor.last(body)
+
+    def _record(self, encoding, raw, sent):
+        if self.stats is not None:
+            self.stats.record(encoding, raw, sent)
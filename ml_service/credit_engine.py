@@ -0,0 +1,218 @@
+# ml_service/credit_engine.py
+"""Estimators behind the credit risk model, chosen and bounded by configuration.
+
+``kind`` is one of ENGINES:
+
+- ``random_forest``: the original model. Trees are fitted on ``n_jobs`` cores
+  (default 1, since training already runs on its own pool).
+- ``hist_gradient_boosting``: binned gradient boosting. It is much faster on
+  large loan books and multi-threaded via OpenMP.
+- ``logistic_regression``: a linear model. It is the smallest and fastest,
+  but the least flexible.
+
+With a budget set, ensembles grow in steps of about a tenth of
+``n_estimators``. Growth stops early once the next step would overrun
+``max_fit_seconds``, or would push the pickled model past ``max_model_mb``.
+A budget of 0 means no limit.
+
+With ``warm_start``, a refit starts from the previously fitted model when
+the engine kind and the label classes match:
+
+- A forest keeps its newest trees and replaces ``refresh_fraction`` of them
+  with trees fitted on the new data. The forest is reseeded first, so the new
+  trees do not repeat the seeds of the kept ones.
+- A logistic regression starts from the previous coefficients.
+- Gradient boosting always refits from scratch, because continuing it would
+  grow the model on every refit.
+"""
+import copy
+import os
+import pickle
+import time
+
+import numpy as np
+
+ENGINES = ("random_forest", "hist_gradient_boosting", "logistic_regression")
+
+ENGINE_NAMES = {
+    "random_forest": "Random Forest Classifier",
+    "hist_gradient_boosting": "Histogram Gradient Boosting Classifier",
+    "logistic_regression": "Logistic Regression",
+}
+
+
+def model_bytes(model):
+    """Pickled size of a fitted estimator"""
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class CreditEngine:
+    """Builds and fits the credit risk estimator within time and size budgets"""
+
+    def __init__(self, kind="random_forest", n_estimators=100, n_jobs=None, max_depth=None,
+                 max_fit_seconds=0.0, max_model_mb=0.0, warm_start=True, refresh_fraction=0.25,
+                 random_state=42):
+        if kind not in ENGINES:
+            raise ValueError(f"Unknown credit engine: {kind}")
+        self.kind = kind
+        self.n_estimators = n_estimators
+        self.n_jobs = n_jobs or 1
+        self.max_depth = max_depth
+        self.max_fit_seconds = max_fit_seconds
+        self.max_model_mb = max_model_mb
+        self.warm_start = warm_start
+        self.refresh_fraction = refresh_fraction
+        self.random_state = random_state
+
+    @classmethod
+    def from_env(cls):
+        """Build an engine from ML_CREDIT_* environment variables"""
+        depth = os.getenv("ML_CREDIT_MAX_DEPTH")
+        return cls(
+            kind=os.getenv("ML_CREDIT_ENGINE", "random_forest"),
+            n_estimators=int(os.getenv("ML_CREDIT_ESTIMATORS", "100")),
+            n_jobs=int(os.getenv("ML_CREDIT_JOBS", "1")),
+            max_depth=int(depth) if depth else None,
+            max_fit_seconds=float(os.getenv("ML_CREDIT_MAX_FIT_SECONDS", "0")),
+            max_model_mb=float(os.getenv("ML_CREDIT_MAX_MODEL_MB", "0")),
+            warm_start=os.getenv("ML_CREDIT_WARM_START", "1") != "0",
+            refresh_fraction=float(os.getenv("ML_CREDIT_REFRESH_FRACTION", "0.25")),
+        )
+
+    def build(self):
+        """An unfitted estimator of this engine's kind"""
+        if self.kind == "hist_gradient_boosting":
+            from sklearn.ensemble import HistGradientBoostingClassifier
+            return HistGradientBoostingClassifier(
+                max_iter=self.n_estimators, max_depth=self.max_depth, early_stopping=False,
+                random_state=self.random_state
+            )
+        if self.kind == "logistic_regression":
+            from sklearn.linear_model import LogisticRegression
+            return LogisticRegression(max_iter=1000)
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(
+            n_estimators=self.n_estimators, max_depth=self.max_depth, n_jobs=self.n_jobs,
+            random_state=self.random_state
+        )
+
+    def can_warm_start(self, previous, y):
+        """Whether ``previous`` is a fitted model this engine can continue from for labels ``y``"""
+        return (
+            self.warm_start
+            and self.kind != "hist_gradient_boosting"
+            and previous is not None
+            and engine_kind(previous) == self.kind
+            and hasattr(previous, "classes_")
+            and np.array_equal(previous.classes_, np.unique(y))
+        )
+
+    def fit(self, X, y, previous=None):
+        """Fit on (X, y); returns (model, report). ``previous`` is never modified."""
+        started = time.perf_counter()
+        warm = self.can_warm_start(previous, y)
+        if self.kind == "logistic_regression":
+            model = copy.deepcopy(previous) if warm else self.build()
+            model.set_params(warm_start=warm)
+            model.fit(X, y)
+            steps, stopped = 1, None
+        else:
+            model, steps, stopped = self._grow(X, y, previous if warm else None, started)
+
+        size = model_bytes(model)
+        report = {
+            "engine": self.kind,
+            "warm_start": warm,
+            "fit_seconds": time.perf_counter() - started,
+            "model_bytes": size,
+            "fit_steps": steps,
+        }
+        if self.kind != "logistic_regression":
+            report["estimators"] = ensemble_size(model)
+        if stopped:
+            report["budget_stopped"] = stopped
+        return model, report
+
+    def _grow(self, X, y, previous, started):
+        """Fit an ensemble in warm-started steps until done or over budget"""
+        if previous is not None:
+            # Keep the newest trees, refit the rest on the new data
+            refresh = max(1, int(round(len(previous.estimators_) * self.refresh_fraction)))
+            model = copy.copy(previous)
+            model.estimators_ = list(previous.estimators_[refresh:])
+            # Warm start draws seeds in sequence from random_state, skipping one
+            # per kept tree; with the same random_state the new trees would
+            # repeat the seeds of the newest kept ones
+            model.set_params(n_jobs=self.n_jobs, random_state=refit_seed(self.random_state, previous))
+            target = len(model.estimators_) + refresh
+            step = refresh
+        else:
+            model = self.build()
+            target = self.n_estimators
+            # Without budgets there is nothing to check between steps
+            step = max(1, target // 10) if self.max_fit_seconds or self.max_model_mb else target
+        model.set_params(warm_start=True)
+
+        size_limit = self.max_model_mb * 1024 * 1024
+        steps, stopped = 0, None
+        grown = ensemble_size(model) if previous is not None else 0
+        while grown < target:
+            grown = min(target, grown + step)
+            model.set_params(**{size_param(model): grown})
+            model.fit(X, y)
+            steps += 1
+            if grown >= target:
+                break
+            elapsed = time.perf_counter() - started
+            if self.max_fit_seconds and elapsed + elapsed / steps > self.max_fit_seconds:
+                stopped = "time"
+                break
+            if size_limit and model_bytes(model) * (grown + step) / grown > size_limit:
+                stopped = "size"
+                break
+
+        # Inference runs on the analysis pool's own workers, one core each
+        model.set_params(warm_start=False, **({"n_jobs": 1} if self.kind == "random_forest" else {}))
+        return model, steps, stopped
+
+    @property
+    def name(self):
+        return ENGINE_NAMES[self.kind]
+
+    def to_dict(self):
+        return {
+            "engine": self.kind,
+            "n_estimators": self.n_estimators,
+            "n_jobs": self.n_jobs,
+            "max_depth": self.max_depth,
+            "max_fit_seconds": self.max_fit_seconds,
+            "max_model_mb": self.max_model_mb,
+            "warm_start": self.warm_start,
+            "refresh_fraction": self.refresh_fraction,
+        }
+
+
+def engine_kind(model):
+    """ENGINES name of a fitted estimator"""
+    return {
+        "RandomForestClassifier": "random_forest",
+        "HistGradientBoostingClassifier": "hist_gradient_boosting",
+        "LogisticRegression": "logistic_regression",
+    }.get(type(model).__name__, type(model).__name__)
+
+
+def refit_seed(random_state, previous):
+    """Seed for a forest's refit, derived from its newest tree so each refit differs"""
+    newest = previous.estimators_[-1].random_state
+    return int(np.random.SeedSequence([random_state, newest]).generate_state(1)[0] >> 1)
+
+
+def size_param(model):
+    return "max_iter" if engine_kind(model) == "hist_gradient_boosting" else "n_estimators"
+
+
+def ensemble_size(model):
+    """Trees (or boosting iterations) in a fitted ensemble"""
+    if engine_kind(model) == "hist_gradient_boosting":
+        return int(model.n_iter_)
+    return len(model.estimators_)
@@ -0,0 +1,114 @@
+# ml_service/customer_index.py
+import numpy as np
+import pandas as pd
+
+
+class CustomerIndex:
+    """Per-customer purchase aggregates for credit features.
+
+    Holds, for every customer seen, total purchases, order count and first
+    and last purchase day as dense arrays, plus daily totals for the most
+    recent ``max(windows)`` days so rolling-window sums stay cheap. ``update``
+    folds in newly arrived sales without rescanning the history, and
+    ``features`` looks up any number of customers in one vectorized join.
+    Windows and recency are measured from the latest sale seen (``as_of``).
+    """
+
+    windows = (30, 90)
+
+    def __init__(self):
+        self.customers = pd.Index([], dtype=object)
+        self.totals = np.zeros(0)
+        self.orders = np.zeros(0, dtype=np.int64)
+        self.first_day = np.zeros(0, dtype="datetime64[D]")
+        self.last_day = np.zeros(0, dtype="datetime64[D]")
+        self.as_of = None
+        # Daily totals per (customer row, day) inside the longest window
+        self._recent = pd.DataFrame({"row": np.zeros(0, dtype=np.int64),
+                                     "day": np.zeros(0, dtype="datetime64[ns]"),
+                                     "amount": np.zeros(0)})
+
+    def __len__(self):
+        return len(self.customers)
+
+    @classmethod
+    def from_frame(cls, frame):
+        index = cls()
+        index.update(frame)
+        return index
+
+    def update(self, frame):
+        """Fold a frame of new sales (SalesTable columns) into the index"""
+        frame = frame[frame["customer"].notna()]
+        if frame.empty:
+            return self
+        day = frame["date"].dt.normalize()
+        grouped = frame.assign(day=day).groupby("customer", observed=True)
+        stats = grouped.agg(
+            amount=("amount", "sum"), orders=("amount", "size"), first=("day", "min"), last=("day", "max")
+        )
+
+        # New customers get rows appended; existing ones are updated in place
+        names = stats.index.astype(object)
+        rows = self.customers.get_indexer(names)
+        new = rows < 0
+        if new.any():
+            n_new = int(new.sum())
+            rows[new] = np.arange(len(self.customers), len(self.customers) + n_new)
+            self.customers = self.customers.append(pd.Index(names[new], dtype=object))
+            self.totals = np.concatenate([self.totals, np.zeros(n_new)])
+            self.orders = np.concatenate([self.orders, np.zeros(n_new, dtype=np.int64)])
+            self.first_day = np.concatenate([self.first_day, stats["first"].to_numpy()[new].astype("datetime64[D]")])
+            self.last_day = np.concatenate([self.last_day, stats["last"].to_numpy()[new].astype("datetime64[D]")])
+
+        self.totals[rows] += stats["amount"].to_numpy()
+        self.orders[rows] += stats["orders"].to_numpy()
+        self.first_day[rows] = np.minimum(self.first_day[rows], stats["first"].to_numpy().astype("datetime64[D]"))
+        self.last_day[rows] = np.maximum(self.last_day[rows], stats["last"].to_numpy().astype("datetime64[D]"))
+
+        latest = day.max()
+        self.as_of = latest if self.as_of is None else max(self.as_of, latest)
+        cutoff = self.as_of - pd.Timedelta(days=max(self.windows) - 1)
+        recent = frame.loc[day >= cutoff]
+        if len(recent):
+            daily = recent.groupby([recent["customer"], recent["date"].dt.normalize()], observed=True)["amount"].sum()
+            codes = self.customers.get_indexer(daily.index.get_level_values(0).astype(object))
+            self._recent = pd.concat([
+                self._recent,
+                pd.DataFrame({"row": codes, "day": daily.index.get_level_values(1), "amount": daily.to_numpy()}),
+            ], ignore_index=True)
+        self._recent = self._recent[self._recent["day"] >= cutoff].reset_index(drop=True)
+        return self
+
+    def window_totals(self, days):
+        """Purchases per customer row over the last ``days`` days"""
+        if self.as_of is None:
+            return np.zeros(len(self))
+        recent = self._recent[self._recent["day"] > self.as_of - pd.Timedelta(days=days)]
+        return np.bincount(recent["row"], weights=recent["amount"], minlength=len(self))
+
+    def features(self, customers):
+        """Aggregates for each given customer name (zeros / NaN for unknown ones)"""
+        rows = self.customers.get_indexer(pd.Index(customers, dtype=object))
+        known = rows >= 0
+        safe = np.where(known, rows, 0)
+
+        def pick(values, missing=0.0):
+            if not len(self):
+                return np.full(len(rows), missing)
+            return np.where(known, values[safe], missing)
+
+        result = pd.DataFrame({
+            "total_purchases": pick(self.totals),
+            "orders": pick(self.orders.astype(float)),
+        })
+        if self.as_of is not None and len(self):
+            as_of = np.datetime64(self.as_of, "D")
+            result["days_since_last_purchase"] = pick((as_of - self.last_day).astype(float), np.nan)
+            result["customer_tenure_days"] = pick((as_of - self.first_day).astype(float), np.nan)
+        else:
+            result["days_since_last_purchase"] = np.nan
+            result["customer_tenure_days"] = np.nan
+        for days in self.windows:
+            result[f"purchases_{days}d"] = pick(self.window_totals(days))
+        return result
@@ -0,0 +1,173 @@
+# ml_service/executor.py
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the worker pool has no room for another request"""
+
+
+class AnalysisExecutor:
+    """Runs CPU-bound analysis sections on a worker pool off the event loop.
+
+    ``mode`` is ``"thread"`` or ``"process"``. At most ``max_workers`` tasks run
+    at once and at most ``max_queue`` more may wait; beyond that new requests
+    are rejected so the caller can answer 429 instead of piling up work.
+    """
+
+    MODES = ("thread", "process")
+
+    def __init__(self, mode="thread", max_workers=None, max_queue=16, timeout=30.0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = None
+        self._pending = 0
+        self._requests = 0
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._timed_out = 0
+        self._completed = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build an executor from ML_EXECUTOR_* environment variables"""
+        workers = os.getenv("ML_EXECUTOR_WORKERS")
+        return cls(
+            mode=os.getenv("ML_EXECUTOR_MODE", "thread"),
+            max_workers=int(workers) if workers else None,
+            max_queue=int(os.getenv("ML_EXECUTOR_QUEUE", "16")),
+            timeout=float(os.getenv("ML_REQUEST_TIMEOUT", "30")),
+        )
+
+    @property
+    def pending(self):
+        """Tasks submitted and not yet finished"""
+        return self._pending
+
+    @property
+    def requests(self):
+        """Calls to ``run`` or ``gather`` with tasks not yet finished"""
+        return self._requests
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="ml-worker"
+                )
+        return self._pool
+
+    def _task_done(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def admit(self, tasks=1):
+        """Reserve room for ``tasks`` tasks, or reject the request if they would overflow the queue.
+
+        The slots count as pending right away, so a burst of requests in one
+        event-loop tick cannot all pass the check. Each is released when its
+        task finishes, or by ``release`` if the task is never submitted.
+        """
+        with self._lock:
+            if self._pending and self._pending + tasks > self.capacity:
+                self._rejected += 1
+                raise ExecutorSaturated(
+                    f"{self._pending} analysis tasks pending (capacity {self.capacity})"
+                )
+            self._pending += tasks
+
+    def release(self, tasks=1):
+        """Give back admitted slots whose tasks were never submitted"""
+        with self._lock:
+            self._pending -= tasks
+
+    def _submit(self, fn, *args):
+        """Submit an admitted task; its slot is released when the worker finishes"""
+        future = self._get_pool().submit(fn, *args)
+        # Counted until the worker actually finishes, even if the caller
+        # gave up waiting, so timeouts cannot hide a busy pool.
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _track_request(self, futures):
+        """Count one request in flight until the last of its tasks finishes"""
+        if not futures:
+            return
+        left = [len(futures)]
+        with self._lock:
+            self._requests += 1
+
+        def finished(_future):
+            with self._lock:
+                left[0] -= 1
+                if left[0] == 0:
+                    self._requests -= 1
+
+        for future in futures:
+            future.add_done_callback(finished)
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` on the pool and await its result"""
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._submit(fn, *args)
+        except Exception:
+            self.release()
+            raise
+        self._track_request([future])
+        return await asyncio.wrap_future(future)
+
+    async def gather(self, calls, timeout=None):
+        """Run several ``(fn, *args)`` calls concurrently under one deadline"""
+        self.admit(len(calls))
+        futures = []
+        try:
+            for fn, *args in calls:
+                futures.append(self._submit(fn, *args))
+        except Exception:
+            self.release(len(calls) - len(futures))
+            self._track_request(futures)
+            raise
+        self._track_request(futures)
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(*(asyncio.wrap_future(future) for future in futures)),
+                timeout or self.timeout,
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.timeout,
+                "pending_tasks": self._pending,
+                "active_requests": self._requests,
+                "completed_tasks": self._completed,
+                "rejected_requests": self._rejected,
+                "timed_out_requests": self._timed_out,
+            }
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
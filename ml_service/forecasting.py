@@ -0,0 +1,110 @@
+# ml_service/forecasting.py
+"""Vectorized multi-step forecasting for many daily series at once.
+
+Models are linear in the six window features SalesForecaster uses (mean,
+std, max, min, day index mod 7, active days over the last seven days).
+Each step of a recursive forecast recomputes all six features for every
+series from its rolling window, so a 90-day horizon over thousands of SKUs
+is 90 array passes rather than one predict call per series per day.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+WINDOW = 7
+
+
+def window_features(windows, sample_index):
+    """Feature rows for windows shaped (..., WINDOW), in build_features order"""
+    day = np.broadcast_to(np.asarray(sample_index) % 7, windows.shape[:-1])
+    return np.stack([
+        windows.mean(axis=-1),
+        windows.std(axis=-1),
+        windows.max(axis=-1),
+        windows.min(axis=-1),
+        day.astype(float),
+        np.count_nonzero(windows > 0, axis=-1).astype(float),
+    ], axis=-1)
+
+
+def history_features(daily):
+    """Training samples for every row of a (series, days) matrix: X (S, N, 6), y (S, N)"""
+    n_samples = daily.shape[1] - WINDOW
+    windows = np.lib.stride_tricks.sliding_window_view(daily[:, :-1], WINDOW, axis=1)
+    return window_features(windows, np.arange(n_samples)), daily[:, WINDOW:]
+
+
+def fit_linear(daily, ridge=1e-3, chunk=512):
+    """Fit one linear model per series by batched least squares.
+
+    Returns raw-feature weights (S, 6), intercepts (S,), residual standard
+    deviations (S,) and in-sample R² (S,). Features are standardized per
+    series and a small ridge term keeps all-zero or constant series solvable.
+    Series are processed ``chunk`` at a time to bound memory.
+    """
+    daily = np.asarray(daily, dtype=float)
+    n_series = len(daily)
+    weights = np.zeros((n_series, 6))
+    intercept = np.zeros(n_series)
+    sigma = np.zeros(n_series)
+    r2 = np.zeros(n_series)
+    for start in range(0, n_series, chunk):
+        block = slice(start, start + chunk)
+        X, y = history_features(daily[block])
+        n = y.shape[1]
+        mean_x, scale = X.mean(axis=1, keepdims=True), X.std(axis=1, keepdims=True)
+        scale[scale < 10 * np.finfo(float).eps] = 1.0
+        Z = (X - mean_x) / scale
+        mean_y = y.mean(axis=1, keepdims=True)
+        gram = np.einsum("snf,sng->sfg", Z, Z) + ridge * n * np.eye(6)
+        coef = np.linalg.solve(gram, np.einsum("snf,sn->sf", Z, y - mean_y)[..., None])[..., 0]
+
+        w = coef / scale[:, 0]
+        b = mean_y[:, 0] - (w * mean_x[:, 0]).sum(axis=1)
+        residuals = y - (np.einsum("snf,sf->sn", X, w) + b[:, None])
+        sse = (residuals ** 2).sum(axis=1)
+        sst = ((y - mean_y) ** 2).sum(axis=1)
+        weights[block], intercept[block] = w, b
+        sigma[block] = np.sqrt(sse / max(n - 7, 1))
+        r2[block] = np.where(sst > 0, 1 - sse / np.where(sst > 0, sst, 1), 0.0)
+    return weights, intercept, sigma, r2
+
+
+def recursive_forecast(daily, weights, intercept, horizon, sample_index=None):
+    """Roll every series forward ``horizon`` days (non-negative predictions).
+
+    ``daily`` is (S, T) history with T >= WINDOW; ``weights`` may be shared
+    (6,) or per series (S, 6). Every feature is recomputed from the rolling
+    window at each step, for all series together. ``sample_index`` is the
+    sample number of the first forecast day, per series when the histories
+    were cut from series of different lengths (default T - WINDOW).
+    """
+    daily = np.atleast_2d(np.asarray(daily, dtype=float))
+    window = daily[:, -WINDOW:].copy()
+    if sample_index is None:
+        sample_index = daily.shape[1] - WINDOW
+    else:
+        sample_index = np.asarray(sample_index, dtype=np.int64)
+    forecast = np.empty((len(daily), horizon))
+    for step in range(horizon):
+        features = window_features(window, sample_index + step)
+        forecast[:, step] = np.maximum((features * weights).sum(axis=-1) + intercept, 0)
+        window[:, :-1] = window[:, 1:]
+        window[:, -1] = forecast[:, step]
+    return forecast
+
+
+def residual_std(y, fitted, n_params=7):
+    """Standard deviation of one-step-ahead residuals"""
+    residuals = np.asarray(y, dtype=float) - fitted
+    return float(np.sqrt((residuals ** 2).sum() / max(len(residuals) - n_params, 1)))
+
+
+def prediction_interval(forecast, sigma, level=0.8):
+    """Normal-theory interval widening with the square root of the horizon step"""
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    steps = np.sqrt(np.arange(1, forecast.shape[-1] + 1))
+    spread = z * np.reshape(sigma, (-1, 1)) * steps
+    if forecast.ndim == 1:
+        spread = spread[0]
+    return np.maximum(forecast - spread, 0), forecast + spread
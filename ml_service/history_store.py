@@ -0,0 +1,281 @@
+# ml_service/history_store.py
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from model_store import SAFE_NAME, directory_lock
+from sales_table import COLUMNS, SalesTable
+
+# Identity of a current-state record; pushing a record with a known key replaces it.
+# Loans without a loan date have no identity and are always added as new loans.
+RECORD_KEYS = {
+    "inventory": ("product",),
+    "loans": ("customer", "loanDate"),
+    "workers": ("name",),
+}
+UNKEYED = {"loans": "loanDate"}
+# Fields a removal request names records by (every loan of a customer at once)
+REMOVE_BY = {"inventory": "product", "loans": "customer", "workers": "name"}
+
+SEGMENT_COLUMNS = ("date", "amount", "quantity", "product", "customer")
+
+
+class DuplicateRecords(ValueError):
+    """A push names the same record twice, so one of them would be silently dropped"""
+
+
+def record_key(kind, record):
+    """Key a record is stored under; a fresh one when it has no identity (see UNKEYED)"""
+    key = "|".join(str(record.get(field) or "") for field in RECORD_KEYS[kind])
+    if kind in UNKEYED and not record.get(UNKEYED[kind]):
+        key += f"|{uuid.uuid4().hex}"
+    return key
+
+
+class HistoryStore:
+    """Per-tenant analysis inputs kept server-side, so clients only send what changed.
+
+    Layout under ``<root>/<tenant>/``:
+
+    - ``sales/manifest.json`` lists the sales segments and the product and
+      customer dictionaries; ``sales/s000001.<column>.npy`` are one segment's
+      columns (dates as int64 nanoseconds, names as int32 dictionary codes).
+      Sales are append-only: every push writes one new segment, and once
+      there are more than ``max_segments`` they are compacted into one.
+      Segments are read memory-mapped.
+    - ``records.json`` holds inventory, loans and workers as current state,
+      keyed by RECORD_KEYS; pushes upsert and remove records by key.
+
+    The sales tables of the ``max_cached`` most recently used tenants stay
+    in memory, and sales pushed through this process extend them (and their
+    customer index) in place of a reload. Writes hold the same thread + file
+    lock as the model store; the in-memory table cache is only touched under
+    the thread lock.
+    """
+
+    def __init__(self, root, max_segments=16, max_cached=32):
+        self.root = root
+        self.max_segments = max_segments
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._tables = OrderedDict()  # tenant -> (sales version, SalesTable)
+
+    def _remember(self, tenant_id, version, table):
+        # Callers hold self._lock
+        self._tables[tenant_id] = (version, table)
+        self._tables.move_to_end(tenant_id)
+        while len(self._tables) > self.max_cached:
+            self._tables.popitem(last=False)
+
+    def _dir(self, tenant_id):
+        if not SAFE_NAME.match(tenant_id or ""):
+            raise ValueError(f"Invalid history store key: {tenant_id!r}")
+        return os.path.join(self.root, tenant_id)
+
+    def _read_json(self, path, default):
+        if not os.path.exists(path):
+            return default
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_json(self, path, content):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp, path)
+
+    def _manifest(self, directory):
+        return self._read_json(os.path.join(directory, "sales", "manifest.json"), {
+            "version": 0, "rows": 0, "segments": [], "products": [], "customers": [],
+        })
+
+    def _records(self, directory):
+        return self._read_json(os.path.join(directory, "records.json"), {
+            "version": 0, **{kind: {} for kind in RECORD_KEYS},
+        })
+
+    # Sales ---------------------------------------------------------------
+
+    def append_sales(self, tenant_id, table):
+        """Append a SalesTable as a new segment; returns the new total row count"""
+        directory = self._dir(tenant_id)
+        frame = table.frame
+        with directory_lock(directory, self._lock):
+            manifest = self._manifest(directory)
+            if len(frame):
+                os.makedirs(os.path.join(directory, "sales"), exist_ok=True)
+                previous = manifest["version"]
+                self._write_segment(directory, manifest, frame)
+                manifest["rows"] += len(frame)
+                manifest["version"] += 1
+                merged = self._compact(directory, manifest) if len(manifest["segments"]) > self.max_segments else []
+                self._write_json(os.path.join(directory, "sales", "manifest.json"), manifest)
+                self._remove_segments(directory, merged)
+
+                cached = self._tables.get(tenant_id)
+                if cached is not None and cached[0] == previous:
+                    self._remember(tenant_id, manifest["version"], cached[1].appended(frame))
+        return manifest["rows"]
+
+    def _write_segment(self, directory, manifest, frame):
+        name = f"s{max((int(s[1:]) for s in manifest['segments']), default=0) + 1:06d}"
+        columns = {
+            "date": frame["date"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+            "amount": frame["amount"].to_numpy(dtype=np.float64),
+            "quantity": frame["quantity"].to_numpy(dtype=np.float64),
+            "product": self._encode(frame["product"], manifest["products"]),
+            "customer": self._encode(frame["customer"], manifest["customers"]),
+        }
+        for column, values in columns.items():
+            np.save(os.path.join(directory, "sales", f"{name}.{column}.npy"), values)
+        manifest["segments"].append(name)
+
+    @staticmethod
+    def _encode(column, dictionary):
+        """Codes into an append-only name dictionary (-1 for missing), extending it in place"""
+        column = column.astype("category")
+        local = column.cat.codes.to_numpy()
+        if not len(column.cat.categories):
+            return np.full(len(local), -1, dtype=np.int32)
+        names = column.cat.categories.astype(str)
+        codes = pd.Index(dictionary, dtype=object).get_indexer(names)
+        new = codes < 0
+        codes[new] = np.arange(len(dictionary), len(dictionary) + int(new.sum()))
+        dictionary.extend(names[new].tolist())
+        return np.where(local >= 0, codes[np.maximum(local, 0)], -1).astype(np.int32)
+
+    def _compact(self, directory, manifest):
+        """Merge every segment into one; returns the merged segments, to remove once the manifest is written"""
+        old = list(manifest["segments"])
+        merged = {column: np.concatenate(self._segment_columns(directory, old, column)) for column in SEGMENT_COLUMNS}
+        name = f"s{int(old[-1][1:]) + 1:06d}"
+        for column, values in merged.items():
+            np.save(os.path.join(directory, "sales", f"{name}.{column}.npy"), values)
+        manifest["segments"] = [name]
+        return old
+
+    def _remove_segments(self, directory, segments):
+        # Readers holding memory maps of these files keep them until they let go
+        for segment in segments:
+            for column in SEGMENT_COLUMNS:
+                try:
+                    os.remove(os.path.join(directory, "sales", f"{segment}.{column}.npy"))
+                except FileNotFoundError:
+                    pass
+
+    def _segment_columns(self, directory, segments, column):
+        return [
+            np.load(os.path.join(directory, "sales", f"{segment}.{column}.npy"), mmap_mode="r")
+            for segment in segments
+        ]
+
+    def sales(self, tenant_id):
+        """The tenant's stored sales as a SalesTable (cached until the history changes)"""
+        directory = self._dir(tenant_id)
+        manifest = self._manifest(directory)
+        with self._lock:
+            cached = self._tables.get(tenant_id)
+            if cached is not None and cached[0] == manifest["version"]:
+                self._tables.move_to_end(tenant_id, last=True)
+                return cached[1]
+        try:
+            table = self._load_sales(directory, manifest)
+        except FileNotFoundError:
+            # Another process compacted the segments after we read the manifest
+            manifest = self._manifest(directory)
+            table = self._load_sales(directory, manifest)
+        with self._lock:
+            # A concurrent push may already have cached a newer version
+            cached = self._tables.get(tenant_id)
+            if cached is None or cached[0] <= manifest["version"]:
+                self._remember(tenant_id, manifest["version"], table)
+        return table
+
+    def _load_sales(self, directory, manifest):
+        if not manifest["segments"]:
+            return SalesTable(records=[])
+
+        def column(name):
+            parts = self._segment_columns(directory, manifest["segments"], name)
+            # A single segment stays a read-only memory map
+            return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+        def categorical(name, dictionary):
+            return pd.Categorical.from_codes(column(name), categories=pd.Index(dictionary, dtype=object))
+
+        frame = pd.DataFrame({
+            "date": column("date").view("datetime64[ns]"),
+            "amount": column("amount"),
+            "product": categorical("product", manifest["products"]),
+            "quantity": column("quantity"),
+            "customer": categorical("customer", manifest["customers"]),
+        }, columns=COLUMNS, copy=False)
+        return SalesTable(frame=frame)
+
+    # Inventory, loans, workers ---------------------------------------------
+
+    def upsert(self, tenant_id, changes, removals=None):
+        """Apply record changes: ``changes`` / ``removals`` map a kind to records / key values"""
+        directory = self._dir(tenant_id)
+        counts = {}
+        with directory_lock(directory, self._lock):
+            stored = self._records(directory)
+            for kind, records in changes.items():
+                keyed = {record_key(kind, record): record for record in records}
+                if len(keyed) < len(records):
+                    fields = " and ".join(RECORD_KEYS[kind])
+                    raise DuplicateRecords(f"Several {kind} records share the same {fields}")
+                stored[kind].update(keyed)
+            for kind, names in (removals or {}).items():
+                names = set(names)
+                field = REMOVE_BY[kind]
+                stored[kind] = {key: r for key, r in stored[kind].items() if r.get(field) not in names}
+            stored["version"] += 1
+            self._write_json(os.path.join(directory, "records.json"), stored)
+            counts = {kind: len(stored[kind]) for kind in RECORD_KEYS}
+        return counts
+
+    def records(self, tenant_id):
+        """Stored inventory, loans and workers as lists of dicts"""
+        stored = self._records(self._dir(tenant_id))
+        return {kind: list(stored[kind].values()) for kind in RECORD_KEYS}
+
+    # Whole history -----------------------------------------------------------
+
+    def exists(self, tenant_id):
+        return os.path.isdir(self._dir(tenant_id))
+
+    def summary(self, tenant_id):
+        directory = self._dir(tenant_id)
+        manifest = self._manifest(directory)
+        stored = self._records(directory)
+        size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(directory) for name in names
+        ) if os.path.isdir(directory) else 0
+        sales = {"rows": manifest["rows"], "segments": len(manifest["segments"]), "version": manifest["version"]}
+        if manifest["segments"]:
+            dates = self._segment_columns(directory, manifest["segments"], "date")
+            sales["first_date"] = str(pd.Timestamp(min(int(d.min()) for d in dates)).date())
+            sales["last_date"] = str(pd.Timestamp(max(int(d.max()) for d in dates)).date())
+        return {
+            "tenant_id": tenant_id,
+            "sales": sales,
+            **{kind: len(stored[kind]) for kind in RECORD_KEYS},
+            "records_version": stored["version"],
+            "disk_bytes": size,
+        }
+
+    def delete(self, tenant_id):
+        directory = self._dir(tenant_id)
+        with self._lock:
+            self._tables.pop(tenant_id, None)
+            existed = os.path.isdir(directory)
+            shutil.rmtree(directory, ignore_errors=True)
+        return existed
@@ -1,22 +1,61 @@
 # ml_service/main.py
-from fastapi import FastAPI, HTTPException
+import time
+STARTED = time.perf_counter()  # startup timings are measured from the first import
+
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import List, Dict, Optional, Literal
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-import joblib
 import json
 import os
+import asyncio
+import hashlib
+import copy
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import forecasting
+from batching import InferenceBatcher
+from compression import CompressionMiddleware, CompressionStats
+from credit_engine import CreditEngine, engine_kind
+from executor import AnalysisExecutor, ExecutorSaturated
+from history_store import RECORD_KEYS, DuplicateRecords, HistoryStore
+from model_store import ModelStore, VersionConflict, data_fingerprint
+from model_cache import ModelCache
+from result_cache import ResultCache, section_key
+from results import FastJSONResponse, ResultTable
+from sampling import SamplingPolicy, sampling_report
+from simulation import simulate_stockouts
+from scheduler import TrainingScheduler
+from serve import StatsBoard
+from metrics import Registry, RequestMetricsMiddleware, run_timed, stage, staged, timing
+from sales_table import SalesTable, SalesUploadError, SalesUploadTooLarge, read_sales_file, upload_format
+
+logger = logging.getLogger("ml_service")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start background work with the server and stop it in reverse order on shutdown"""
+    start_training_scheduler()
+    start_warm_up()
+    try:
+        yield
+    finally:
+        stop_warm_up()
+        await stop_training_scheduler()
+        shutdown_executor()
 
 app = FastAPI(
     title="Rice Mill ML Intelligence Engine",
     description="Machine Learning models for business predictions",
-    version="2.0"
+    version="2.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -26,8 +65,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # The dashboard is cross-origin; without this it cannot read the ETag to send If-None-Match
+    expose_headers=["ETag"],
 )
 
+# Prometheus-style metrics, exported on /api/ml/metrics
+metrics_registry = Registry()
+http_seconds = metrics_registry.histogram(
+    "http_request_seconds", "HTTP request latency by route and status", ("path", "status")
+)
+stage_seconds = metrics_registry.histogram(
+    "stage_seconds", "Self time of analysis stages", ("section", "stage")
+)
+section_seconds = metrics_registry.histogram(
+    "section_seconds", "Wall time of each analysis section on a worker", ("section",)
+)
+analysis_seconds = metrics_registry.histogram(
+    "analysis_seconds", "End-to-end analysis time including validation", ("endpoint",)
+)
+tenant_seconds = metrics_registry.summary(
+    "tenant_analysis_seconds", "Analysis time per tenant (find slow mills)", ("tenant",)
+)
+inference_batch_calls = metrics_registry.histogram(
+    "inference_batch_calls", "Prediction calls coalesced into one model call", ("model",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+inference_batch_wait_seconds = metrics_registry.histogram(
+    "inference_batch_wait_seconds", "Latency added by waiting for an inference batch", ("model",)
+)
+
+# Responses of ML_COMPRESS_MIN_BYTES or more are gzip/brotli-compressed per Accept-Encoding
+compression_stats = CompressionStats()
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("ML_COMPRESS_MIN_BYTES", "1024")),
+    gzip_level=int(os.getenv("ML_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("ML_BROTLI_QUALITY", "4")),
+    stats=compression_stats
+)
+app.add_middleware(RequestMetricsMiddleware, histogram=http_seconds)
+
 # Pydantic models for data validation
 class SaleRecord(BaseModel):
     date: str
@@ -62,12 +139,114 @@ class WorkerRecord(BaseModel):
     productivity: Optional[float] = None
     skillLevel: Optional[str] = "medium"
 
+TENANT_ID_PATTERN = r"^[A-Za-z0-9_.-]{1,64}$"
+
+# Most demand scenarios one stock simulation may draw per SKU, and in total across
+# SKUs. At roughly 10M scenario-SKUs per second per core, the default total keeps
+# a simulation to a few seconds, well inside ML_REQUEST_TIMEOUT.
+MAX_SIMULATION_SCENARIOS = int(os.getenv("ML_MAX_SIMULATION_SCENARIOS", "100000"))
+MAX_SIMULATION_CELLS = int(os.getenv("ML_MAX_SIMULATION_CELLS", "20000000"))
+
+class StockSimulation(BaseModel):
+    """Monte Carlo mode for stock predictions (see simulation.py)"""
+    scenarios: int = Field(10_000, ge=100, le=MAX_SIMULATION_SCENARIOS)
+    lead_time_days: float = Field(5, gt=0)
+    lead_time_std: float = Field(1.5, ge=0)
+    service_level: float = Field(0.95, gt=0, lt=1)
+    review_days: int = Field(7, ge=0)
+    seed: int = 0
+
+# Analysis sections: the request inputs each reads and the tenant model it uses
+# (together they key its cached result). Sections depend on nothing but their
+# inputs, so the selected ones run concurrently.
+SECTIONS = {
+    "sales_forecast": {"inputs": ("sales",), "model": "sales_forecast"},
+    "stock_predictions": {"inputs": ("sales", "inventory", "stock_simulation"), "model": None},
+    "credit_risk": {"inputs": ("loans", "sales"), "model": "credit_risk"},
+    "operational_insights": {"inputs": ("workers", "sales"), "model": None},
+}
+SECTION_ALIASES = {
+    "full_analysis": tuple(SECTIONS),
+    "forecast": ("sales_forecast",),
+    "stock": ("stock_predictions",),
+    "credit": ("credit_risk",),
+    "operations": ("operational_insights",),
+}
+
+def selected_sections(request_type):
+    """Sections named by a request_type: 'full_analysis' or comma-separated section names/aliases"""
+    selected = []
+    for name in (part.strip() for part in request_type.split(",")):
+        for section in SECTION_ALIASES.get(name, (name,)):
+            if section not in SECTIONS:
+                choices = ", ".join(list(SECTION_ALIASES) + list(SECTIONS))
+                raise ValueError(f"Unknown analysis section '{name}' (choose from {choices})")
+            if section not in selected:
+                selected.append(section)
+    return selected
+
 class MLRequest(BaseModel):
     sales: List[SaleRecord] = []
     inventory: List[InventoryItem] = []
     loans: List[LoanRecord] = []
     workers: List[WorkerRecord] = []
     request_type: str = "full_analysis"
+    tenant_id: Optional[str] = Field(None, pattern=TENANT_ID_PATTERN)
+    stock_simulation: Optional[StockSimulation] = None
+    
+    @field_validator("request_type")
+    @classmethod
+    def check_request_type(cls, value):
+        selected_sections(value)
+        return value
+    
+    @field_validator("stock_simulation")
+    @classmethod
+    def check_simulation_size(cls, value, info):
+        # Rejected up front: a simulation past the timeout would keep its worker busy after the 504
+        skus = len(info.data.get("inventory") or [])
+        if value is not None and value.scenarios * skus > MAX_SIMULATION_CELLS:
+            raise ValueError(
+                f"{value.scenarios} scenarios x {skus} SKUs exceeds {MAX_SIMULATION_CELLS} "
+                f"simulated scenario-SKUs; use fewer scenarios"
+            )
+        return value
+    
+    @property
+    def sections(self):
+        return selected_sections(self.request_type)
+
+class TrainRequest(BaseModel):
+    tenant_id: str = Field(pattern=TENANT_ID_PATTERN)
+    model_type: str
+    sales: List[SaleRecord] = []
+    loans: List[LoanRecord] = []
+    promote: bool = True
+    priority: Literal["high", "normal", "low"] = "normal"
+
+class SalesUpdateRequest(BaseModel):
+    sales: List[SaleRecord]
+
+class HistoryPush(BaseModel):
+    """New sales plus changed inventory, loans and workers for a tenant's stored history"""
+    sales: List[SaleRecord] = []
+    inventory: List[InventoryItem] = []
+    loans: List[LoanRecord] = []
+    workers: List[WorkerRecord] = []
+    remove_inventory: List[str] = []  # products
+    remove_loans: List[str] = []      # customers (all of their loans)
+    remove_workers: List[str] = []    # worker names
+
+# Longest forecast horizon (days) served by /api/ml/forecast
+MAX_FORECAST_HORIZON = int(os.getenv("ML_MAX_FORECAST_HORIZON", "365"))
+
+class ForecastRequest(BaseModel):
+    sales: List[SaleRecord]
+    tenant_id: Optional[str] = Field(None, pattern=TENANT_ID_PATTERN)
+    horizon: int = Field(30, ge=1, le=MAX_FORECAST_HORIZON)
+    group_by: Literal["total", "product", "customer"] = "total"
+    level: float = Field(0.8, gt=0, lt=1)
+    limit: Optional[int] = Field(None, ge=1)
 
 class MLResponse(BaseModel):
     success: bool
@@ -79,70 +258,228 @@ class MLResponse(BaseModel):
     business_recommendations: Optional[List] = None
     ml_metrics: Optional[Dict] = None
 
+class BatchRequest(BaseModel):
+    requests: List[MLRequest]
+
+class BatchItem(BaseModel):
+    index: int
+    tenant_id: Optional[str] = None
+    response: MLResponse
+
+class BatchResponse(BaseModel):
+    success: bool
+    message: str
+    succeeded: int
+    failed: int
+    elapsed_seconds: float
+    results: List[BatchItem]
+
 # ML Models
 class SalesForecaster:
     def __init__(self):
+        # scikit-learn is imported on first use; it dominates import time
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
         self.model = LinearRegression()
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.metrics = {}
+        # Daily totals plus least-squares sums, kept so new days can be folded in
+        self.state = None
         
+    window_size = 7
+    # Fewest daily samples (days after the first window) the model is fitted on
+    min_training_samples = 10
+    
+    @classmethod
+    def has_training_data(cls, sales_data):
+        """Whether train() would accept this sales history"""
+        sales = SalesTable.of(sales_data)
+        return len(sales) >= 7 and len(sales.daily_amount()) - cls.window_size >= cls.min_training_samples
+    
+    def to_artifact(self):
+        """Fitted estimators to persist in the model store"""
+        return {"model": self.model, "scaler": self.scaler, "state": self.state}
+    
+    @classmethod
+    def from_artifact(cls, artifact):
+        forecaster = cls()
+        forecaster.model = artifact["model"]
+        forecaster.scaler = artifact["scaler"]
+        forecaster.state = artifact.get("state")
+        forecaster.is_trained = True
+        return forecaster
+    
+    @staged("feature_prep")
     def prepare_features(self, sales_data):
         """Prepare time-series features from sales data"""
-        if len(sales_data) < 7:
+        sales = SalesTable.of(sales_data)
+        if len(sales) < 7:
             return None, None
-            
-        df = pd.DataFrame([s.dict() for s in sales_data])
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
-        df = df.set_index('date')
-        
-        # Resample to daily frequency
-        daily_sales = df['amount'].resample('D').sum().fillna(0)
-        
-        # Create features
-        features = []
-        targets = []
-        
-        window_size = 7
-        for i in range(len(daily_sales) - window_size):
-            window = daily_sales[i:i+window_size].values
-            target = daily_sales[i+window_size]
-            
-            # Basic features
-            feature_vector = [
-                window.mean(),  # mean sales
-                window.std(),   # std sales
-                window.max(),   # max sales
-                window.min(),   # min sales
-                i % 7,          # day of week
-                len([x for x in window if x > 0])  # active days
-            ]
-            
-            features.append(feature_vector)
-            targets.append(target)
         
-        return np.array(features), np.array(targets)
+        # Resample to daily frequency (cached on the shared sales table)
+        daily_sales = sales.daily_amount()
+        
+        return self.build_features(daily_sales.to_numpy(dtype=float))
+    
+    def build_features(self, daily, start_index=0):
+        """Compute window features for every day of a daily sales array in one pass"""
+        window_size = self.window_size
+        n_samples = max(0, len(daily) - window_size)
+        if n_samples == 0:
+            return np.empty((0, 6)), np.empty(0)
+        
+        # Each row is the window preceding the target day (no copies made)
+        windows = np.lib.stride_tricks.sliding_window_view(daily[:-1], window_size)
+        
+        X = np.column_stack([
+            windows.mean(axis=1),                   # mean sales
+            windows.std(axis=1),                    # std sales
+            windows.max(axis=1),                    # max sales
+            windows.min(axis=1),                    # min sales
+            (start_index + np.arange(n_samples)) % 7,  # day of week
+            np.count_nonzero(windows > 0, axis=1),  # active days
+        ])
+        y = daily[window_size:]
+        return X, y
     
-    def train(self, sales_data):
+    @staged("fit")
+    def train(self, sales_data, features=None):
         """Train the sales forecasting model"""
-        X, y = self.prepare_features(sales_data)
-        if X is None or len(X) < 10:
+        X, y = features if features is not None else self.prepare_features(sales_data)
+        if X is None or len(X) < self.min_training_samples:
             return False
             
-        X_scaled = self.scaler.fit_transform(X)
-        self.model.fit(X_scaled, y)
+        self._fit(X, y)
+        
+        sales = SalesTable.of(sales_data)
+        if len(sales) >= 7:
+            daily_sales = sales.daily_amount()
+            self.state = {
+                "start": daily_sales.index[0],
+                "daily": daily_sales.to_numpy(dtype=float),
+                "moments": self._moments(X, y),
+                "updates_since_refit": 0
+            }
+        return True
+    
+    def _fit(self, X, y):
+        """Fit on the daily/weekly tiers of the samples, scoring on all of them"""
+        rows = training_sampling.sales_rows(len(X))
+        started = time.perf_counter()
+        X_fit, y_fit = (X, y) if rows is None else (X[rows], y[rows])
+        self.scaler.fit(X_fit)
+        self.model.fit(self.scaler.transform(X_fit), y_fit)
+        fit_seconds = time.perf_counter() - started
+        self.is_trained = True
+        r2 = float(self.model.score(self.scaler.transform(X), y))
+        self.metrics = {"samples": int(len(X_fit)), "r2": r2}
+        if rows is not None:
+            self.metrics["sampling"] = sampling_report("daily_weekly_tiers", len(X), len(rows), fit_seconds, r2)
+    
+    @staticmethod
+    def _moments(X, y):
+        """Sums that determine the least-squares fit; additive across samples"""
+        return {
+            "n": len(y), "sx": X.sum(axis=0), "sy": float(y.sum()),
+            "sxx": X.T @ X, "sxy": X.T @ y, "syy": float(y @ y)
+        }
+    
+    def update(self, sales_data):
+        """Fold newly arrived sales into the fitted model.
+        
+        Only samples whose window or target touches a changed day are
+        re-featurized, so appending the latest days costs O(new rows) no
+        matter how long the history is. Returns the number of days changed.
+        """
+        if self.state is None:
+            raise ValueError("Model has no incremental state; retrain it on the full history")
+        
+        new_daily = SalesTable.of(sales_data).daily_amount()
+        if len(new_daily) == 0:
+            return 0
+        offsets = (new_daily.index - self.state["start"]).days.to_numpy()
+        if offsets.min() < 0:
+            raise ValueError("New sales predate the model's history; retrain it on the full history")
+        
+        old = self.state["daily"]
+        daily = np.zeros(max(len(old), offsets.max() + 1))
+        daily[:len(old)] = old
+        np.add.at(daily, offsets, new_daily.to_numpy(dtype=float))
+        
+        # Swap the contributions of every sample affected by the changed days,
+        # including the zero-filled days of any gap after the old history
+        first = max(0, min(offsets.min(), len(old)) - self.window_size)
+        X_old, y_old = self.build_features(old[first:], start_index=first)
+        X_new, y_new = self.build_features(daily[first:], start_index=first)
+        removed, added = self._moments(X_old, y_old), self._moments(X_new, y_new)
+        moments = self.state["moments"]
+        for key in moments:
+            moments[key] = moments[key] - removed[key] + added[key]
+        
+        self.state["daily"] = daily
+        self.state["updates_since_refit"] += 1
+        if moments["n"] >= 10:
+            self._solve(moments)
+        return int(len(new_daily))
+    
+    def _solve(self, moments):
+        """Least squares from the sums, expressed as the usual scaler + linear model"""
+        n = moments["n"]
+        mean_x = moments["sx"] / n
+        mean_y = moments["sy"] / n
+        cov_xx = moments["sxx"] / n - np.outer(mean_x, mean_x)
+        cov_xy = moments["sxy"] / n - mean_x * mean_y
+        var = np.clip(np.diag(cov_xx), 0, None)
+        scale = np.sqrt(var)
+        scale[scale < 10 * np.finfo(float).eps] = 1.0  # as StandardScaler does
+        
+        # In standardized space the intercept is the target mean
+        coef = np.linalg.lstsq(cov_xx / np.outer(scale, scale), cov_xy / scale, rcond=None)[0]
+        
+        self.scaler.mean_, self.scaler.var_, self.scaler.scale_ = mean_x, var, scale
+        self.scaler.n_samples_seen_ = n
+        self.scaler.n_features_in_ = len(mean_x)
+        self.model.coef_, self.model.intercept_ = coef, mean_y
+        self.model.n_features_in_ = len(mean_x)
         self.is_trained = True
+        
+        var_y = moments["syy"] / n - mean_y ** 2
+        self.metrics = {
+            "samples": int(n),
+            "r2": float(coef @ (cov_xy / scale) / var_y) if var_y > 0 else 0.0,
+            "updates_since_refit": self.state["updates_since_refit"]
+        }
+    
+    def refit(self):
+        """Full refit from the stored daily history (resets accumulated rounding)"""
+        daily = self.state["daily"]
+        X, y = self.build_features(daily)
+        if len(X) < 10:
+            return False
+        self._fit(X, y)
+        self.state["moments"] = self._moments(X, y)
+        self.state["updates_since_refit"] = 0
         return True
     
-    def predict(self, sales_data, days=7):
-        """Predict sales for next n days"""
+    def linear_form(self):
+        """The fitted scaler + model as raw-feature weights and an intercept"""
+        weights = self.model.coef_ / self.scaler.scale_
+        return weights, float(self.model.intercept_ - weights @ self.scaler.mean_)
+    
+    @staged("predict")
+    def predict(self, sales_data, days=7, level=0.8):
+        """Predict sales for next n days, with a `level` prediction interval"""
+        # Features are built once and shared by training, forecasting and scoring
+        X, y = self.prepare_features(sales_data)
+        
         # Ensure model + scaler are fitted; if insufficient data, bail gracefully
+        shared = self.is_trained
         if not self.is_trained:
-            trained = self.train(sales_data)
+            trained = self.train(sales_data, features=(X, y))
             if not trained:
                 return None
             
-        X, y = self.prepare_features(sales_data)
         if X is None or len(X) == 0:
             return None
         
@@ -153,27 +490,34 @@ class SalesForecaster:
             self.model.fit(self.scaler.transform(X), y)
             self.is_trained = True
             
-        last_features = X[-1].reshape(1, -1)
-        last_features_scaled = self.scaler.transform(last_features)
-        
-        predictions = []
-        for i in range(days):
-            pred = self.model.predict(last_features_scaled)[0]
-            predictions.append(max(0, pred))  # Ensure non-negative
-            
-            # Update features for next prediction
-            new_features = last_features.copy()
-            new_features[0][0] = (new_features[0][0] * 6 + pred) / 7  # Update mean
-            new_features[0][4] = (new_features[0][4] + 1) % 7  # Update day of week
-            last_features_scaled = self.scaler.transform(new_features)
+        # Whole horizon at once: every feature is rolled forward from the
+        # predicted days, not just the mean and day of week
+        weights, intercept = self.linear_form()
+        daily = SalesTable.of(sales_data).daily_amount().to_numpy(dtype=float)
+        if shared:
+            # A stored model: concurrent forecasts on it roll forward as one batch
+            # of (first sample index, last window) rows
+            window = forecasting.WINDOW
+            row = np.concatenate([[len(daily) - window], daily[-window:]])[None, :]
+            predictions = inference_batcher.run(
+                ("sales_forecast", id(self), days),
+                lambda rows: forecasting.recursive_forecast(rows[:, 1:], weights, intercept, days, rows[:, 0]),
+                row
+            )[0]
+        else:
+            predictions = forecasting.recursive_forecast(daily, weights, intercept, days)[0]
+        sigma = forecasting.residual_std(y, X @ weights + intercept)
+        lower, upper = forecasting.prediction_interval(predictions, sigma, level)
         
         confidence = self.model.score(
-            self.scaler.transform(X), 
-            self.prepare_features(sales_data)[1][:len(X)]
+            self.scaler.transform(X), y
         ) if len(X) > 10 else 0.75
         
         return {
-            "predictions": [float(p) for p in predictions],
+            "predictions": predictions.tolist(),
+            "lower": lower.tolist(),
+            "upper": upper.tolist(),
+            "interval_level": level,
             "confidence": float(max(0, min(1, confidence))),
             "model": "LinearRegression",
             "features_used": 6
@@ -181,237 +525,347 @@ class SalesForecaster:
 
 class StockRiskPredictor:
     def __init__(self):
-        self.consumption_model = RandomForestClassifier(n_estimators=50, random_state=42)
+        self._consumption_model = None
         self.risk_categories = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+    
+    @property
+    def consumption_model(self):
+        if self._consumption_model is None:
+            from sklearn.ensemble import RandomForestClassifier
+            self._consumption_model = RandomForestClassifier(n_estimators=50, random_state=42)
+        return self._consumption_model
+        
+    trailing_days = 7
+    stat_columns = ["daily_mean", "recent_mean", "daily_std", "consumption"]
         
+    @staged("feature_prep")
     def calculate_consumption_pattern(self, sales_data, inventory_data):
-        """Calculate daily consumption from sales data"""
+        """Daily consumption statistics for every product in one group-by pass"""
         if not sales_data or not inventory_data:
-            return {}
-            
-        df = pd.DataFrame([s.dict() for s in sales_data])
-        df['date'] = pd.to_datetime(df['date'])
-        
-        consumption_by_product = {}
-        for product in [i.product for i in inventory_data]:
-            product_sales = df[df['product'] == product]
-            if len(product_sales) > 0:
-                daily_avg = product_sales.groupby('date')['quantity'].sum().mean()
-                consumption_by_product[product] = max(1, daily_avg or 10)
-        
-        return consumption_by_product
-    
-    def predict_stock_risk(self, inventory_data, consumption_patterns):
-        """Predict stock depletion risk"""
-        predictions = []
-        
-        for item in inventory_data:
-            item_dict = item.dict()
-            product = item_dict['product']
-            current_stock = item_dict['currentStock']
-            
-            # Calculate daily consumption
-            daily_consumption = item_dict.get('dailyConsumption') or \
-                            consumption_patterns.get(product) or \
-                            10  # Default
-            
-            # Safety stock calculation
-            safety_stock = item_dict.get('minimumStock') or \
-                        item_dict.get('reorderLevel') or \
-                        daily_consumption * 7
+            return pd.DataFrame(columns=self.stat_columns, dtype=float)
             
-            # Lead time estimation (days)
-            lead_time = 5  # Default lead time
-            
-            # Days until safety stock is reached
-            if daily_consumption > 0:
-                days_to_safety = (current_stock - safety_stock) / daily_consumption
-            else:
-                days_to_safety = float('inf')
-            
-            # Days until stockout
-            days_to_empty = current_stock / daily_consumption if daily_consumption > 0 else float('inf')
-            
-            # Risk classification
-            if days_to_empty < lead_time:
-                risk_level = "CRITICAL"
-            elif days_to_safety < lead_time * 1.5:
-                risk_level = "HIGH"
-            elif days_to_safety < lead_time * 3:
-                risk_level = "MEDIUM"
-            else:
-                risk_level = "LOW"
-            
-            # Recommended order quantity
-            if risk_level in ["CRITICAL", "HIGH"]:
-                recommended_order = max(
-                    safety_stock * 2 - current_stock,
-                    daily_consumption * lead_time * 1.2
-                )
-            else:
-                recommended_order = 0
-            
-            predictions.append({
-                "product": product,
-                "current_stock": float(current_stock),
-                "daily_consumption": float(daily_consumption),
-                "safety_stock": float(safety_stock),
-                "days_to_safety": float(days_to_safety),
-                "days_to_empty": float(days_to_empty),
-                "risk_level": risk_level,
-                "recommended_order": float(recommended_order),
-                "urgency": "IMMEDIATE" if risk_level == "CRITICAL" else "PLAN" if risk_level == "HIGH" else "MONITOR"
-            })
-        
-        return predictions
+        df = SalesTable.of(sales_data).frame
+        
+        # Quantity sold per (product, day), then per-product statistics over days
+        day = df['date'].dt.normalize()
+        daily = df.groupby([df['product'], day], observed=True)['quantity'].sum()
+        by_product = daily.groupby(level=0, observed=True)
+        stats = pd.DataFrame({
+            "daily_mean": by_product.mean(),
+            "daily_std": by_product.std(ddof=0),
+        })
+        stats.index = stats.index.astype(object)
+        
+        # Trailing-window mean over the most recent days (days without sales count as zero)
+        cutoff = day.max() - pd.Timedelta(days=self.trailing_days)
+        recent = daily[daily.index.get_level_values(1) > cutoff]
+        recent_total = recent.groupby(level=0, observed=True).sum()
+        recent_total.index = recent_total.index.astype(object)
+        stats["recent_mean"] = recent_total.reindex(stats.index).fillna(0) / self.trailing_days
+        
+        # Consumption used for risk: the higher of the long-run and trailing means, so a
+        # recent surge shortens days-to-stockout at once; zero means unknown (default 10),
+        # floored at 1
+        current = stats[["daily_mean", "recent_mean"]].max(axis=1)
+        stats["consumption"] = np.maximum(1, current.replace(0, 10))
+        return stats[self.stat_columns]
+    
+    @staticmethod
+    def _first_given(*columns):
+        """Element-wise first value that is set and non-zero (vectorized `a or b or c`)"""
+        result = np.full(len(columns[-1]), np.nan)
+        for column in reversed(columns):
+            column = np.asarray(column, dtype=float)
+            given = ~np.isnan(column) & (column != 0)
+            result = np.where(given, column, result)
+        return result
+    
+    # Demand variability (std / mean) assumed for products without learned statistics
+    default_demand_cv = 0.3
+    
+    @staged("predict")
+    def predict_stock_risk(self, inventory_data, consumption_patterns, lead_time=5, simulation=None):
+        """Predict stock depletion risk for all inventory items at once.
+        
+        With a StockSimulation, Monte Carlo columns are added: stockout
+        probability within the lead time, days-to-empty mean and percentiles,
+        and service-level reorder point and order quantity.
+        """
+        if not inventory_data:
+            return []
+        
+        products = [i.product for i in inventory_data]
+        current_stock = np.array([i.currentStock for i in inventory_data], dtype=float)
+        
+        demand_cv = np.full(len(products), np.nan)
+        if isinstance(consumption_patterns, pd.DataFrame):
+            learned = consumption_patterns["consumption"].reindex(products).to_numpy(dtype=float)
+            stats = consumption_patterns.reindex(products)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                demand_cv = (stats["daily_std"] / stats["daily_mean"]).to_numpy(dtype=float)
+        else:
+            learned = np.array([consumption_patterns.get(p) for p in products], dtype=float)
+        
+        # Calculate daily consumption (given, else learned from sales, else default 10)
+        daily_consumption = self._first_given(
+            [i.dailyConsumption for i in inventory_data], learned, np.full(len(products), 10.0)
+        )
+        
+        # Safety stock calculation
+        safety_stock = self._first_given(
+            [i.minimumStock for i in inventory_data],
+            [i.reorderLevel for i in inventory_data],
+            daily_consumption * 7
+        )
+        
+        # Days until safety stock is reached and until stockout
+        consuming = daily_consumption > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_to_safety = np.where(consuming, (current_stock - safety_stock) / daily_consumption, np.inf)
+            days_to_empty = np.where(consuming, current_stock / daily_consumption, np.inf)
+        
+        # Risk classification
+        critical = days_to_empty < lead_time
+        high = ~critical & (days_to_safety < lead_time * 1.5)
+        medium = ~critical & ~high & (days_to_safety < lead_time * 3)
+        risk_level = np.select([critical, high, medium], ["CRITICAL", "HIGH", "MEDIUM"], "LOW")
+        urgency = np.select([critical, high], ["IMMEDIATE", "PLAN"], "MONITOR")
+        
+        # Recommended order quantity
+        recommended_order = np.where(
+            critical | high,
+            np.maximum(safety_stock * 2 - current_stock, daily_consumption * lead_time * 1.2),
+            0.0
+        )
+        
+        columns = {
+            "product": products,
+            "current_stock": current_stock,
+            "daily_consumption": daily_consumption,
+            "safety_stock": safety_stock,
+            "days_to_safety": days_to_safety,
+            "days_to_empty": days_to_empty,
+            "risk_level": risk_level,
+            "recommended_order": recommended_order,
+            "urgency": urgency
+        }
+        if simulation is not None:
+            demand_cv = np.where(np.isfinite(demand_cv), demand_cv, self.default_demand_cv)
+            with stage("simulate"):
+                columns.update(simulate_stockouts(
+                    current_stock, daily_consumption, daily_consumption * demand_cv,
+                    lead_time=simulation.lead_time_days, lead_time_std=simulation.lead_time_std,
+                    scenarios=simulation.scenarios, service_level=simulation.service_level,
+                    review_days=simulation.review_days, seed=simulation.seed
+                ))
+        return ResultTable(columns)
 
 class CreditRiskAnalyzer:
     def __init__(self):
-        self.risk_model = RandomForestClassifier(n_estimators=100, random_state=42)
+        from sklearn.preprocessing import StandardScaler
+        self.risk_model = credit_engine.build()
         self.scaler = StandardScaler()
+        self.is_trained = False
+        self.metrics = {}
+        
+    def to_artifact(self):
+        """Fitted estimators to persist in the model store"""
+        return {"model": self.risk_model, "scaler": self.scaler}
+    
+    @classmethod
+    def from_artifact(cls, artifact):
+        analyzer = cls()
+        analyzer.risk_model = artifact["model"]
+        analyzer.scaler = artifact["scaler"]
+        analyzer.is_trained = True
+        return analyzer
         
+    @staticmethod
+    def loan_columns(loan_data):
+        """Loan fields as arrays, read straight from the records"""
+        n = len(loan_data)
+        return {
+            "customer": [loan.customer for loan in loan_data],
+            "amount": np.fromiter((loan.outstandingAmount for loan in loan_data), dtype=float, count=n),
+            "overdue": np.fromiter((loan.overdueDays or 0 for loan in loan_data), dtype=float, count=n),
+            "past_defaults": np.fromiter((loan.pastDefaults or 0 for loan in loan_data), dtype=float, count=n),
+            "wholesale": np.fromiter((loan.customerType == 'wholesale' for loan in loan_data), dtype=float, count=n),
+            "new_customer": np.fromiter((loan.customerType == 'new' for loan in loan_data), dtype=float, count=n),
+        }
+    
+    @staged("feature_prep")
     def prepare_loan_features(self, loan_data, sales_data):
-        """Prepare features for credit risk analysis"""
-        features = []
-        labels = []
-        customer_sales = {}
+        """Prepare features for credit risk analysis (all loans in one vectorized pass)"""
+        loans = self.loan_columns(loan_data)
+        amount, overdue, past_defaults = loans["amount"], loans["overdue"], loans["past_defaults"]
         
-        # Calculate customer sales from sales data
+        # Customer's total purchases, joined from the sales table's customer index
+        customer_total = 0
         if sales_data:
-            sales_df = pd.DataFrame([s.dict() for s in sales_data])
-            customer_sales = sales_df.groupby('customer')['amount'].sum().to_dict()
+            index = SalesTable.of(sales_data).customer_index()
+            customer_total = index.features(loans["customer"])["total_purchases"].to_numpy()
         
-        for loan in loan_data:
-            loan_dict = loan.dict()
-            
-            # Feature engineering
-            amount = loan_dict['outstandingAmount']
-            overdue = loan_dict.get('overdueDays', 0)
-            past_defaults = loan_dict.get('pastDefaults', 0)
-            
-            # Customer's total purchases
-            customer_total = customer_sales.get(loan_dict['customer'], 0)
-            
-            # Credit utilization ratio
-            credit_ratio = amount / max(1, customer_total)
-            
-            # Payment behavior score
-            payment_score = 100 - min(100, overdue * 2 + past_defaults * 20)
-            
-            # Risk label (simulated - in real system this would be historical data)
-            if overdue > 30 or past_defaults > 0 or credit_ratio > 2:
-                risk_label = 1  # High risk
-            else:
-                risk_label = 0  # Low risk
-            
-            features.append([
-                amount / 10000,  # Normalized amount
-                overdue / 30,    # Normalized overdue days
-                past_defaults,
-                credit_ratio,
-                payment_score / 100,
-                1 if loan_dict.get('customerType') == 'wholesale' else 0
-            ])
-            labels.append(risk_label)
-        
-        return np.array(features), np.array(labels)
+        # Credit utilization ratio
+        credit_ratio = amount / np.maximum(1, customer_total)
+        
+        # Payment behavior score
+        payment_score = 100 - np.minimum(100, overdue * 2 + past_defaults * 20)
+        
+        # Risk label (simulated - in real system this would be historical data)
+        labels = ((overdue > 30) | (past_defaults > 0) | (credit_ratio > 2)).astype(int)
+        
+        features = np.column_stack([
+            amount / 10000,  # Normalized amount
+            overdue / 30,    # Normalized overdue days
+            past_defaults,
+            credit_ratio,
+            payment_score / 100,
+            loans["wholesale"]
+        ])
+        return features, labels
+    
+    @staticmethod
+    def trainable(labels):
+        """More than 10 loans covering both risk classes"""
+        return len(labels) > 10 and len(np.unique(labels)) > 1
     
+    @classmethod
+    def has_training_data(cls, loan_data, sales_data):
+        """Whether train() would accept these loans"""
+        if len(loan_data) <= 10:
+            return False
+        return cls.trainable(cls().prepare_loan_features(loan_data, sales_data)[1])
+    
+    @staged("fit")
+    def train(self, loan_data, sales_data, previous=None):
+        """Fit the risk model once for reuse; returns False if data is insufficient.
+        
+        ``previous`` is the artifact of the model being replaced, which the
+        credit engine may warm-start from.
+        """
+        X, y = self.prepare_loan_features(loan_data, sales_data)
+        if not self.trainable(y):
+            return False
+        
+        self._fit(X, y, loan_data, previous)
+        self.is_trained = True
+        return True
+    
+    def _fit(self, X, y, loan_data, previous=None):
+        """Fit on a stratified, recency-weighted sample of the loans; returns all of X scaled"""
+        rows = training_sampling.loan_rows(y, [loan.loanDate for loan in loan_data])
+        started = time.perf_counter()
+        X_fit, y_fit = (X, y) if rows is None else (X[rows], y[rows])
+        base = None
+        if previous is not None and credit_engine.can_warm_start(previous["model"], y_fit):
+            # Kept trees split on features scaled the previous model's way
+            base = previous["model"]
+            self.scaler = copy.deepcopy(previous["scaler"])
+        else:
+            self.scaler.fit(X_fit)
+        self.risk_model, report = credit_engine.fit(self.scaler.transform(X_fit), y_fit, base)
+        fit_seconds = time.perf_counter() - started
+        X_scaled = self.scaler.transform(X)
+        accuracy = float(self.risk_model.score(X_scaled, y))
+        self.metrics = {
+            "samples": int(len(X_fit)),
+            "accuracy": accuracy,
+            "high_risk_rate": float(y.mean()),
+            "engine": report
+        }
+        if rows is not None:
+            self.metrics["sampling"] = sampling_report("stratified_time_decay", len(X), len(rows), fit_seconds, accuracy)
+        return X_scaled
+    
+    @staged("predict")
     def analyze_risk(self, loan_data, sales_data):
-        """Analyze credit risk for all loans"""
-        if len(loan_data) < 5:
-            return self._basic_risk_analysis(loan_data)
+        """Analyze credit risk for all loans.
+        
+        Every row's ``method`` names the path that scored it: the engine kind
+        (e.g. ``random_forest``), ``rule_based`` for too little data, or
+        ``rule_based_fallback`` when the model failed. Rule-based time is
+        reported as the ``rule_based`` / ``fallback`` stage.
+        """
+        if len(loan_data) < 5 and not self.is_trained:
+            with stage("rule_based"):
+                return self._basic_risk_analysis(loan_data)
         
         try:
             X, y = self.prepare_loan_features(loan_data, sales_data)
-            if len(X) > 10:
-                X_scaled = self.scaler.fit_transform(X)
-                self.risk_model.fit(X_scaled, y)
-                
-                predictions = self.risk_model.predict_proba(X_scaled)
-                feature_importance = self.risk_model.feature_importances_
+            if self.is_trained:
+                # Persisted model: inference only, no refit per request; concurrent
+                # requests on the same model are scored in one batch
+                predictions = inference_batcher.run(("credit_risk", id(self)), self.high_risk_probability, X)
+            elif self.trainable(y):
+                with stage("fit"):
+                    self._fit(X, y, loan_data)
+                predictions = self.high_risk_probability(X)
             else:
-                return self._basic_risk_analysis(loan_data)
-        except:
-            return self._basic_risk_analysis(loan_data)
+                with stage("rule_based"):
+                    return self._basic_risk_analysis(loan_data)
+        except Exception:
+            logger.exception("Credit risk model failed on %d loans; using rule-based scores", len(loan_data))
+            with stage("fallback"):
+                return self._basic_risk_analysis(loan_data, method="rule_based_fallback")
         
-        results = []
-        for idx, loan in enumerate(loan_data):
-            loan_dict = loan.dict()
-            
-            if idx < len(predictions):
-                risk_prob = predictions[idx][1]  # Probability of high risk
-            else:
-                risk_prob = self._calculate_basic_risk(loan_dict)
-            
-            # Convert probability to risk level
-            if risk_prob > 0.7:
-                risk_level = "HIGH"
-            elif risk_prob > 0.4:
-                risk_level = "MEDIUM"
-            else:
-                risk_level = "LOW"
-            
-            results.append({
-                "customer": loan_dict['customer'],
-                "outstanding_amount": float(loan_dict['outstandingAmount']),
-                "overdue_days": loan_dict.get('overdueDays', 0),
-                "past_defaults": loan_dict.get('pastDefaults', 0),
-                "risk_score": float(risk_prob * 100),
-                "risk_level": risk_level,
-                "recommended_action": self._get_recommended_action(risk_level, loan_dict)
-            })
-        
-        return results
-    
-    def _basic_risk_analysis(self, loan_data):
+        # Recent activity from the same customer index, for collection follow-up
+        loans = self.loan_columns(loan_data)
+        activity = {"purchases_90d": np.zeros(len(loan_data)), "days_since_last_purchase": [None] * len(loan_data)}
+        if sales_data:
+            features = SalesTable.of(sales_data).customer_index().features(loans["customer"])
+            activity["purchases_90d"] = features["purchases_90d"].to_numpy()
+            activity["days_since_last_purchase"] = [
+                None if np.isnan(days) else int(days) for days in features["days_since_last_purchase"]
+            ]
+        
+        # Convert probability of high risk to risk level
+        risk_level = np.select([predictions > 0.7, predictions > 0.4], ["HIGH", "MEDIUM"], "LOW")
+        return self._risk_table(
+            loans, predictions * 100, risk_level, method=[engine_kind(self.risk_model)] * len(loan_data), **activity
+        )
+    
+    def high_risk_probability(self, X):
+        """Probability of the high-risk class for raw feature rows"""
+        high_risk_col = list(self.risk_model.classes_).index(1)
+        return self.risk_model.predict_proba(self.scaler.transform(X))[:, high_risk_col]
+    
+    def _basic_risk_analysis(self, loan_data, method="rule_based"):
         """Basic rule-based risk analysis for small datasets"""
-        results = []
-        for loan in loan_data:
-            loan_dict = loan.dict()
-            risk_score = self._calculate_basic_risk(loan_dict)
-            
-            if risk_score > 70:
-                risk_level = "HIGH"
-            elif risk_score > 40:
-                risk_level = "MEDIUM"
-            else:
-                risk_level = "LOW"
-            
-            results.append({
-                "customer": loan_dict['customer'],
-                "outstanding_amount": float(loan_dict['outstandingAmount']),
-                "overdue_days": loan_dict.get('overdueDays', 0),
-                "past_defaults": loan_dict.get('pastDefaults', 0),
-                "risk_score": float(risk_score),
-                "risk_level": risk_level,
-                "recommended_action": self._get_recommended_action(risk_level, loan_dict),
-                "method": "rule_based"
-            })
-        
-        return results
-    
-    def _calculate_basic_risk(self, loan_dict):
-        """Calculate basic risk score using rules"""
-        score = 0
-        score += min(loan_dict.get('overdueDays', 0) * 2, 40)
-        score += loan_dict.get('pastDefaults', 0) * 20
-        if loan_dict['outstandingAmount'] > 50000:
-            score += 20
-        if loan_dict.get('customerType') == 'new':
-            score += 10
-        
-        return min(100, score)
-    
-    def _get_recommended_action(self, risk_level, loan_dict):
-        """Get recommended action based on risk level"""
-        if risk_level == "HIGH":
-            return "Immediate collection action required"
-        elif risk_level == "MEDIUM":
-            return "Schedule payment reminder and follow-up"
-        else:
-            return "Monitor regularly"
+        loans = self.loan_columns(loan_data)
+        risk_score = self._calculate_basic_risk(loans)
+        risk_level = np.select([risk_score > 70, risk_score > 40], ["HIGH", "MEDIUM"], "LOW")
+        return self._risk_table(loans, risk_score, risk_level, method=[method] * len(loan_data))
+    
+    def _calculate_basic_risk(self, loans):
+        """Calculate basic risk scores using rules"""
+        score = np.minimum(loans["overdue"] * 2, 40)
+        score += loans["past_defaults"] * 20
+        score += np.where(loans["amount"] > 50000, 20, 0)
+        score += loans["new_customer"] * 10
+        
+        return np.minimum(100, score)
+    
+    recommended_actions = {
+        "HIGH": "Immediate collection action required",
+        "MEDIUM": "Schedule payment reminder and follow-up",
+        "LOW": "Monitor regularly",
+    }
+    
+    def _risk_table(self, loans, risk_score, risk_level, **extra):
+        """One result row per loan, built column-wise"""
+        return ResultTable({
+            "customer": loans["customer"],
+            "outstanding_amount": loans["amount"],
+            "overdue_days": loans["overdue"].astype(int),
+            "past_defaults": loans["past_defaults"].astype(int),
+            "risk_score": np.asarray(risk_score, dtype=float),
+            "risk_level": risk_level,
+            "recommended_action": [self.recommended_actions[level] for level in risk_level.tolist()],
+            **extra
+        })
 
 class OperationalAnalyzer:
+    @staged("predict")
     def analyze_efficiency(self, workers, sales_data):
         """Analyze operational efficiency"""
         if not workers:
@@ -421,7 +875,7 @@ class OperationalAnalyzer:
         total_workers = len(workers)
         
         # Calculate average sales per worker
-        total_sales = sum(s.amount for s in sales_data) if sales_data else 0
+        total_sales = SalesTable.of(sales_data).total_amount() if sales_data else 0
         avg_sales_per_worker = total_sales / max(1, total_workers)
         
         # Efficiency score (0-1)
@@ -454,46 +908,428 @@ class OperationalAnalyzer:
             ]
         }
 
-# Initialize ML models
-sales_forecaster = SalesForecaster()
+# Initialize ML models (stateless analyzers are shared; fitted models are per tenant)
 stock_predictor = StockRiskPredictor()
-credit_analyzer = CreditRiskAnalyzer()
 operational_analyzer = OperationalAnalyzer()
 
-@app.post("/api/ml/analyze", response_model=MLResponse)
-async def analyze_data(request: MLRequest):
-    """Main endpoint for ML analysis"""
-    try:
-        results = {}
-        
-        # 1. Sales Forecasting (ML Model)
-        if request.sales and len(request.sales) >= 7:
-            sales_forecast = sales_forecaster.predict(request.sales)
-            if sales_forecast:
-                results["sales_forecast"] = sales_forecast
-        
-        # 2. Stock Risk Prediction
-        if request.inventory:
-            consumption_patterns = stock_predictor.calculate_consumption_pattern(
-                request.sales, request.inventory
-            )
-            stock_predictions = stock_predictor.predict_stock_risk(
-                request.inventory, consumption_patterns
-            )
-            results["stock_predictions"] = stock_predictions
-        
-        # 3. Credit Risk Analysis
-        if request.loans:
-            credit_risk = credit_analyzer.analyze_risk(request.loans, request.sales)
-            results["credit_risk"] = credit_risk
-        
-        # 4. Operational Efficiency
-        if request.workers:
-            operational_insights = operational_analyzer.analyze_efficiency(
-                request.workers, request.sales
-            )
-            results["operational_insights"] = operational_insights
-        
+# Worker pool for CPU-bound analysis (configured via ML_EXECUTOR_* env vars)
+analysis_executor = AnalysisExecutor.from_env()
+
+def observe_inference_batch(model, calls, rows, waits):
+    inference_batch_calls.observe(calls, model=model)
+    for wait in waits:
+        inference_batch_wait_seconds.observe(wait, model=model)
+
+# Concurrent predictions on one stored model run as one call (ML_INFERENCE_BATCH_* env
+# vars; a wait of 0 turns batching off). Leaders only wait while another request is in flight:
+# the sections of one request never batch with each other.
+inference_batcher = InferenceBatcher(
+    max_batch=int(os.getenv("ML_INFERENCE_BATCH_MAX_ROWS", "4096")),
+    max_wait=float(os.getenv("ML_INFERENCE_BATCH_WAIT_MS", "2")) / 1000,
+    should_wait=lambda: analysis_executor.requests > 1,
+    observe=observe_inference_batch
+)
+
+# Separate pool for nightly multi-mill batches so they never starve live requests
+batch_executor = AnalysisExecutor(
+    mode=os.getenv("ML_BATCH_MODE", "process"),
+    max_workers=int(os.getenv("ML_BATCH_WORKERS", "0")) or os.cpu_count(),
+    max_queue=int(os.getenv("ML_BATCH_MAX_REQUESTS", "1000")),
+    timeout=float(os.getenv("ML_BATCH_TIMEOUT", "300"))
+)
+# Mills are handed to the batch pool only as workers free up, so each one's
+# ML_BATCH_TIMEOUT covers its own run and not its wait behind other mills
+batch_slots = asyncio.Semaphore(batch_executor.max_workers)
+
+# Persisted, versioned models per tenant (loaded at startup)
+MODEL_TYPES = {
+    "sales_forecast": SalesForecaster,
+    "credit_risk": CreditRiskAnalyzer,
+}
+model_store = ModelStore(
+    os.getenv("ML_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_store")),
+    keep_versions=int(os.getenv("ML_MODEL_KEEP_VERSIONS", "20"))
+)
+
+# Per-tenant fitted models held in memory (ML_MODEL_CACHE_MB budget, ML_MODEL_CACHE_TTL seconds)
+model_cache = ModelCache(
+    max_bytes=int(float(os.getenv("ML_MODEL_CACHE_MB", "256")) * 1024 * 1024),
+    ttl=float(os.getenv("ML_MODEL_CACHE_TTL", "3600"))
+)
+
+# Training-set reduction limits (ML_TRAIN_* env vars, see sampling.py)
+training_sampling = SamplingPolicy.from_env()
+
+# Credit risk estimator, its fit budgets and warm starts (ML_CREDIT_* env vars, see credit_engine.py)
+credit_engine = CreditEngine.from_env()
+
+def train_model(model_type, sales, loans, previous=None):
+    """Fit a fresh model of the given type; returns (model, metrics) or None.
+    
+    ``previous`` is the artifact of the tenant's current credit model, for warm starts.
+    """
+    model = MODEL_TYPES[model_type]()
+    sales = SalesTable.of(sales)
+    trained = model.train(sales) if model_type == "sales_forecast" else model.train(loans, sales, previous)
+    return (model, model.metrics) if trained else None
+
+# Section results keyed by input content (ML_RESULT_CACHE_* env vars)
+result_cache = ResultCache.from_env()
+
+# Store manifest stamp of each cached model; a different stamp on disk means
+# this or another server process saved or activated a version since
+model_stamps = {}
+
+def load_model(tenant_id, model_type):
+    """(Re)load the active stored model for a tenant into the cache"""
+    key = (tenant_id, model_type)
+    model_cache.invalidate(key)
+    model_stamps[key] = model_store.stamp(tenant_id, model_type)
+    loaded = model_store.load(tenant_id, model_type)
+    if loaded is None:
+        return None
+    artifact, meta = loaded
+    model_cache.put(key, MODEL_TYPES[model_type].from_artifact(artifact))
+    return meta
+
+def tenant_model(tenant_id, model_type):
+    """Fitted model for a tenant: cached, else loaded from the store.
+    
+    Tenant models are never fitted here; ensure_tenant_models queues that in
+    the background. Until one exists, and for requests without a tenant, a
+    fresh per-request instance is returned so nobody is ever served
+    coefficients fitted on another mill's data.
+    """
+    if not tenant_id:
+        return MODEL_TYPES[model_type]()
+    
+    key = (tenant_id, model_type)
+    stamp = model_store.stamp(tenant_id, model_type)
+    if model_stamps.get(key) != stamp:
+        model_cache.invalidate(key)
+    
+    def build():
+        model_stamps[key] = stamp
+        loaded = model_store.load(tenant_id, model_type)
+        return MODEL_TYPES[model_type].from_artifact(loaded[0]) if loaded is not None else None
+    
+    return model_cache.get_or_create(key, build) or MODEL_TYPES[model_type]()
+
+def load_stored_models(pin=False):
+    """Put every tenant's active model in the cache; returns how many were loaded.
+    
+    With ``pin`` the models are kept until replaced, whatever the cache's TTL
+    and byte budget (see ModelCache).
+    """
+    loaded = 0
+    for (tenant_id, model_type), (artifact, meta) in model_store.load_active().items():
+        if model_type in MODEL_TYPES:
+            model_stamps[(tenant_id, model_type)] = model_store.stamp(tenant_id, model_type)
+            model_cache.put((tenant_id, model_type), MODEL_TYPES[model_type].from_artifact(artifact), pinned=pin)
+            loaded += 1
+    return loaded
+
+# Background model fitting (ML_TRAINING_* env vars), kept off the inference pool
+training_executor = AnalysisExecutor(
+    mode=os.getenv("ML_TRAINING_MODE", "process"),
+    max_workers=int(os.getenv("ML_TRAINING_WORKERS", "1")),
+    timeout=float(os.getenv("ML_TRAINING_TIMEOUT", "600"))
+)
+training_scheduler = TrainingScheduler(
+    max_concurrent=training_executor.max_workers,
+    history=int(os.getenv("ML_TRAINING_JOB_HISTORY", "500"))
+)
+
+# Data fingerprint and time of each tenant model's last failed training; the
+# same data is not retried automatically for ML_TRAINING_RETRY_SECONDS
+training_failures = {}
+TRAINING_RETRY_SECONDS = float(os.getenv("ML_TRAINING_RETRY_SECONDS", "3600"))
+
+def training_runner(tenant_id, model_type, sales, loans, fingerprint, promote=True):
+    """Job runner that fits a model on the training pool and saves it as a new version"""
+    async def run(job):
+        try:
+            meta = await fit_and_save(job)
+        except Exception:
+            training_failures[(tenant_id, model_type)] = (fingerprint, time.monotonic())
+            raise
+        training_failures.pop((tenant_id, model_type), None)
+        return meta
+    
+    async def fit_and_save(job):
+        existing = model_store.find(tenant_id, model_type, fingerprint)
+        if existing:
+            return existing
+        job.phase = "fitting"
+        previous = None
+        if model_type == "credit_risk" and credit_engine.warm_start:
+            current = model_cache.get((tenant_id, model_type))
+            previous = current.to_artifact() if current is not None and current.is_trained else None
+        trained = await asyncio.wait_for(
+            training_executor.run(train_model, model_type, sales, loans, previous), training_executor.timeout
+        )
+        if not trained:
+            raise ValueError("Not enough data to train this model")
+        model, metrics = trained
+        job.phase = "saving"
+        meta = await run_in_threadpool(
+            model_store.save, tenant_id, model_type, model.to_artifact(), fingerprint, metrics, promote
+        )
+        if meta["active"]:
+            load_model(tenant_id, model_type)
+        return meta
+    return run
+
+def training_fingerprint(model_type, sales, loans):
+    return data_fingerprint(sales) if model_type == "sales_forecast" else data_fingerprint(loans, sales)
+
+def schedule_training(tenant_id, model_type, sales, loans, priority="normal", promote=True, fingerprint=None):
+    """Queue (or fold into a queued job) training of a tenant model"""
+    fingerprint = fingerprint or training_fingerprint(model_type, sales, loans)
+    runner = training_runner(tenant_id, model_type, sales, loans, fingerprint, promote)
+    return training_scheduler.submit(tenant_id, model_type, runner, priority=priority)
+
+def missing_tenant_models(tenant_id, sales, loans=None, sections=tuple(SECTIONS)):
+    """(model type, training fingerprint) of the sections' tenant models that do not exist yet
+    and could be trained on this data.
+    
+    Checking the data builds daily totals and the customer index and hashes
+    the inputs, so this runs on the thread pool; ensure_tenant_models then
+    queues the training on the event loop.
+    """
+    if not tenant_id:
+        return []
+    has_data = {
+        "sales_forecast": lambda: SalesForecaster.has_training_data(sales),
+        "credit_risk": lambda: bool(loans) and CreditRiskAnalyzer.has_training_data(loans, sales),
+    }
+    needed = [SECTIONS[section]["model"] for section in sections if SECTIONS[section]["model"]]
+    missing = []
+    for model_type in needed:
+        if model_cache.get((tenant_id, model_type)) is not None:
+            continue
+        if model_store.versions(tenant_id, model_type)["active"] is not None:
+            continue
+        if not has_data[model_type]():
+            continue
+        fingerprint = training_fingerprint(model_type, sales, loans)
+        failed = training_failures.get((tenant_id, model_type))
+        if (failed is not None and time.monotonic() - failed[1] < TRAINING_RETRY_SECONDS
+                and failed[0] == fingerprint):
+            continue
+        missing.append((model_type, fingerprint))
+    return missing
+
+def ensure_tenant_models(tenant_id, sales, loans, missing):
+    """Queue low-priority training of missing_tenant_models not already queued or running"""
+    for model_type, fingerprint in missing:
+        if training_scheduler.active(tenant_id, model_type) is None:
+            schedule_training(tenant_id, model_type, sales, loans, priority="low", fingerprint=fingerprint)
+
+def start_training_scheduler():
+    training_scheduler.start()
+
+async def stop_training_scheduler():
+    await training_scheduler.stop()
+    training_executor.shutdown(wait=False)
+
+# Analysis sections - plain functions so they can run on a thread or process pool
+def run_sales_forecast(sales, tenant_id=None):
+    """1. Sales Forecasting (ML Model)"""
+    return tenant_model(tenant_id, "sales_forecast").predict(sales)
+
+def run_group_forecast(sales, by, days, level=0.8, limit=None):
+    """Per-product or per-customer forecasts, one linear model per series fitted in one pass"""
+    if not sales:
+        return None
+    dates, names, daily = SalesTable.of(sales).daily_matrix(by)
+    if daily.shape[1] < forecasting.WINDOW + 10:
+        return None
+    with stage("fit"):
+        weights, intercept, sigma, r2 = forecasting.fit_linear(daily)
+    with stage("predict"):
+        predictions = forecasting.recursive_forecast(daily, weights, intercept, days)
+        lower, upper = forecasting.prediction_interval(predictions, sigma, level)
+    
+    # Largest expected volume first; `limit` keeps only the top series
+    order = np.argsort(-predictions.sum(axis=1), kind="stable")[:limit]
+    future = pd.date_range(dates[-1] + timedelta(days=1), periods=days, freq="D")
+    return {
+        "group_by": by,
+        "horizon_days": days,
+        "interval_level": level,
+        "dates": future.strftime("%Y-%m-%d").tolist(),
+        "series_count": int(len(names)),
+        "series": [
+            {
+                by: str(names[i]),
+                "predictions": predictions[i].tolist(),
+                "lower": lower[i].tolist(),
+                "upper": upper[i].tolist(),
+                "total": float(predictions[i].sum()),
+                "r2": float(r2[i])
+            }
+            for i in order
+        ],
+        "model": "LinearRegression per series"
+    }
+
+def run_forecast(request, sales):
+    """Total forecast with the tenant's model, or per-group forecasts"""
+    if request.group_by != "total":
+        return run_group_forecast(sales, request.group_by, request.horizon, request.level, request.limit)
+    if len(sales) < 7:
+        return None
+    forecast = tenant_model(request.tenant_id, "sales_forecast").predict(
+        sales, days=request.horizon, level=request.level
+    )
+    if forecast:
+        start = sales.daily_amount().index[-1] + timedelta(days=1)
+        forecast["dates"] = pd.date_range(start, periods=request.horizon, freq="D").strftime("%Y-%m-%d").tolist()
+        forecast["horizon_days"] = request.horizon
+    return forecast
+
+def run_stock_predictions(sales, inventory, simulation=None):
+    """2. Stock Risk Prediction"""
+    consumption_patterns = stock_predictor.calculate_consumption_pattern(sales, inventory)
+    if simulation is None:
+        return stock_predictor.predict_stock_risk(inventory, consumption_patterns)
+    return stock_predictor.predict_stock_risk(
+        inventory, consumption_patterns, lead_time=simulation.lead_time_days, simulation=simulation
+    )
+
+def run_credit_risk(loans, sales, tenant_id=None):
+    """3. Credit Risk Analysis"""
+    return tenant_model(tenant_id, "credit_risk").analyze_risk(loans, sales)
+
+def run_operational_insights(workers, sales):
+    """4. Operational Efficiency"""
+    return operational_analyzer.analyze_efficiency(workers, sales)
+
+def plan_sections(request, sales):
+    """List the (result key, cache key, function, *args) sections the request selects and has data for.
+
+    Only inputs of selected sections are fingerprinted, and the sales table
+    builds its derived views (daily totals, customer index) on first use, so
+    a stock-only request never aggregates customers or touches the credit model.
+    """
+    selected = request.sections
+    fingerprints = {}
+    def fingerprint(name):
+        # Each input is hashed at most once per request
+        if name not in fingerprints:
+            value = sales if name == "sales" else getattr(request, name)
+            fingerprints[name] = data_fingerprint([value] if isinstance(value, BaseModel) else value)
+        return fingerprints[name]
+    
+    def cache_key(section):
+        # Results of tenant models are also keyed to the active version on disk
+        parts = [fingerprint(name) for name in SECTIONS[section]["inputs"]]
+        model_type = SECTIONS[section]["model"]
+        if model_type is not None:
+            tenant = request.tenant_id
+            parts.insert(0, f"{tenant}:{model_store.stamp(tenant, model_type)}" if tenant else "")
+        return section_key(section, *parts)
+    
+    sections = []
+    if "sales_forecast" in selected and len(sales) >= 7:
+        sections.append((
+            "sales_forecast", cache_key("sales_forecast"),
+            run_sales_forecast, sales, request.tenant_id
+        ))
+    if "stock_predictions" in selected and request.inventory:
+        sections.append((
+            "stock_predictions", cache_key("stock_predictions"),
+            run_stock_predictions, sales, request.inventory, request.stock_simulation
+        ))
+    if "credit_risk" in selected and request.loans:
+        sections.append((
+            "credit_risk", cache_key("credit_risk"),
+            run_credit_risk, request.loans, sales, request.tenant_id
+        ))
+    if "operational_insights" in selected and request.workers:
+        sections.append((
+            "operational_insights", cache_key("operational_insights"),
+            run_operational_insights, request.workers, sales
+        ))
+    return sections
+
+def prepare_analysis(request, sales):
+    """(SalesTable, plan_sections, missing_tenant_models) for a request.
+    
+    Builds the frame and hashes inputs, so run it off the event loop.
+    """
+    sales = SalesTable.of(sales)
+    plan = plan_sections(request, sales)
+    return sales, plan, missing_tenant_models(request.tenant_id, sales, request.loans, request.sections)
+
+def run_sections(calls):
+    """Run one request's sections in order (batch worker entry point)"""
+    return [fn(*args) for fn, *args in calls]
+
+def timed_calls(pending, profile=None):
+    """Wrap pending section calls so each reports its stage timings"""
+    return [(run_timed, key, profile, *call) for key, _, call in pending]
+
+def record_analysis(endpoint, request, request_stages, section_timings, total):
+    """Feed one analysis' timings into the metrics registry"""
+    for name, seconds in request_stages.items():
+        stage_seconds.observe(seconds, section="request", stage=name)
+    for section, stages in section_timings.items():
+        for name, seconds in stages.items():
+            if name == "total":
+                section_seconds.observe(seconds, section=section)
+            else:
+                stage_seconds.observe(seconds, section=section, stage=name)
+    analysis_seconds.observe(total, endpoint=endpoint)
+    tenant_seconds.observe(total, tenant=request.tenant_id or "anonymous")
+
+# Server-side state that changes results without changing their inputs; part of
+# every ETag so a deploy or reconfiguration invalidates what clients hold
+ETAG_SALT = json.dumps(
+    [app.version, credit_engine.to_dict(), training_sampling.to_dict()], sort_keys=True, default=str
+)
+
+def analysis_etag(plan, layout):
+    """Weak ETag of an analysis response.
+    
+    Derived from the planned sections' cache keys, which already cover the
+    input fingerprints and tenant model versions, so it is known before any
+    section runs.
+    """
+    parts = [ETAG_SALT, layout] + [f"{key}={cache_key}" for key, cache_key, *_ in plan]
+    return f'W/"{hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check; entity tags compare weakly, ignoring the W/ prefix (RFC 9110)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+def validator_headers(etag):
+    # no-cache: clients may keep the body but must revalidate it on every poll
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def split_cached(plan):
+    """Planned sections split into cached results and (key, cache key, call) still to run"""
+    results, pending = {}, []
+    for key, cache_key, *call in plan:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending.append((key, cache_key, call))
+    return results, pending
+
+def finish_analysis(results, pending, outputs):
+    """Merge and cache fresh section outputs, then add recommendations and metrics"""
+    for (key, cache_key, _), output in zip(pending, outputs):
+        if output:
+            results[key] = output
+            result_cache.put(cache_key, output)
+    
+    with stage("recommendations"):
         # 5. Generate business recommendations
         recommendations = generate_recommendations(results)
         results["business_recommendations"] = recommendations
@@ -501,24 +1337,703 @@ async def analyze_data(request: MLRequest):
         # 6. Calculate ML metrics
         ml_metrics = calculate_ml_metrics(results)
         results["ml_metrics"] = ml_metrics
+    
+    # Sections are already well-formed; skip re-validating every result row
+    return MLResponse.model_construct(
+        success=True,
+        message="ML analysis completed successfully",
+        **results
+    )
+
+def failed_response(message, error):
+    return MLResponse(
+        success=False,
+        message=message,
+        sales_forecast=None,
+        stock_predictions=None,
+        credit_risk=None,
+        operational_insights=None,
+        business_recommendations=[],
+        ml_metrics={"error": error}
+    )
+
+def shutdown_executor():
+    analysis_executor.shutdown(wait=False)
+    batch_executor.shutdown(wait=False)
+
+# Startup phases; the service reports ready once warm-up has finished (ML_WARMUP=0 skips
+# the synthetic analysis, stored models are always loaded)
+WARMUP_ENABLED = os.getenv("ML_WARMUP", "1") != "0"
+startup = {
+    "ready": False,
+    "import_seconds": None,
+    "model_load_seconds": None,
+    "models_loaded": 0,
+    "warmup_seconds": None,
+    "ready_seconds": None,
+    "error": None
+}
+warm_up_task = None
+models_preloaded = False
+
+def warm_up_analysis():
+    """Run every section once on a tiny synthetic mill to pay first-use costs up front"""
+    import synthetic
+    from results import dumps
+    data = synthetic.workload("tiny", seed=0)
+    request = MLRequest.model_validate(synthetic.ml_request_payload(data))
+    sales = SalesTable.of(request.sales)
+    outputs = {key: fn(*args) for key, _, fn, *args in plan_sections(request, sales)}
+    dumps(outputs)
+    return len(outputs)
+
+async def warm_up():
+    try:
+        if not models_preloaded:
+            started = time.perf_counter()
+            startup["models_loaded"] = await run_in_threadpool(load_stored_models)
+            startup["model_load_seconds"] = time.perf_counter() - started
         
-        return MLResponse(
-            success=True,
-            message="ML analysis completed successfully",
-            **results
-        )
+        if WARMUP_ENABLED:
+            started = time.perf_counter()
+            # One run per worker so every thread or process pays its own first-use costs
+            await asyncio.gather(*(
+                analysis_executor.run(warm_up_analysis) for _ in range(analysis_executor.max_workers)
+            ))
+            startup["warmup_seconds"] = time.perf_counter() - started
+    except Exception as e:
+        # Warm-up is best effort; requests still work, just slower at first
+        startup["error"] = str(e)
+    startup["ready"] = True
+    startup["ready_seconds"] = time.perf_counter() - STARTED
+
+def start_warm_up():
+    # In the background, so liveness probes answer while models load
+    global warm_up_task, stats_task
+    warm_up_task = asyncio.create_task(warm_up())
+    if stats_board is not None:
+        stats_task = asyncio.create_task(publish_worker_stats())
+
+def stop_warm_up():
+    for task in (warm_up_task, stats_task):
+        if task is not None and not task.done():
+            task.cancel()
+
+# Multi-worker mode (ML_WORKERS > 1, see serve.py): models are loaded once before
+# forking and each worker publishes its stats for /api/ml/workers
+worker_id = 0
+stats_board = None
+stats_task = None
+STATS_INTERVAL = float(os.getenv("ML_STATS_INTERVAL", "5"))
+
+def preload_models():
+    """Load stored models in the parent process so forked workers share them"""
+    global models_preloaded
+    started = time.perf_counter()
+    # Pinned: a TTL reload or eviction would give each worker a private copy
+    startup["models_loaded"] = load_stored_models(pin=True)
+    startup["model_load_seconds"] = time.perf_counter() - started
+    models_preloaded = True
+
+def start_worker(index, board):
+    global worker_id, stats_board
+    worker_id, stats_board = index, board
+
+def worker_stats():
+    return {
+        "ready": startup["ready"],
+        "executor": analysis_executor.stats(),
+        "model_cache": model_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "inference_batching": inference_batcher.stats(),
+        "training": training_scheduler.stats()
+    }
+
+async def publish_worker_stats():
+    while True:
+        try:
+            await run_in_threadpool(stats_board.publish, worker_id, worker_stats())
+        except OSError:
+            pass  # Stats are best effort
+        await asyncio.sleep(STATS_INTERVAL)
+
+@app.get("/api/ml/workers")
+async def get_worker_stats():
+    """Stats of every server worker process and their sum"""
+    if stats_board is None:
+        workers = {str(worker_id): dict(worker_stats(), worker=worker_id, pid=os.getpid())}
+    else:
+        stats_board.publish(worker_id, worker_stats())
+        workers = stats_board.collect()
+    return {"workers": workers, "total": StatsBoard.aggregate(workers.values())}
+
+# Largest sales history accepted by the streaming upload endpoint
+MAX_UPLOAD_ROWS = int(os.getenv("ML_MAX_UPLOAD_ROWS", "5000000"))
+
+PROFILE_MODES = ("stages", "functions")
+
+def profile_mode(query, header):
+    """Opt-in profiling via ?profile= or X-ML-Profile: stages | functions"""
+    mode = (query or header or "").lower()
+    if not mode:
+        return None
+    if mode in ("1", "true", "yes"):
+        return "stages"
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of {', '.join(PROFILE_MODES)}")
+    return mode
+
+def received_seconds(http_request):
+    """Time from request arrival to the handler (body read, JSON parse, validation)"""
+    started = getattr(http_request.state, "ml_started", None)
+    return time.perf_counter() - started if started else 0.0
+
+@app.post("/api/ml/analyze", response_model=MLResponse)
+async def analyze_data(
+    request: MLRequest,
+    http_request: Request,
+    profile: Optional[str] = None,
+    x_ml_profile: Optional[str] = Header(None),
+    layout: Literal["records", "columnar", "compact"] = "records",
+    if_none_match: Optional[str] = Header(None)
+):
+    """Main endpoint for ML analysis.
+    
+    `layout=columnar` returns row results as column lists; `layout=compact`
+    also sends repeated strings (risk levels, actions) as a dictionary plus
+    codes. `request_type` selects the sections to compute: `full_analysis`
+    (default) or a comma-separated list such as `stock` or `forecast,credit`;
+    the other sections are returned as null.
+    
+    Responses carry an ETag of their inputs; polling clients that send it
+    back as If-None-Match get 304 Not Modified while nothing changed.
+    """
+    # One columnar sales table per request, shared by every section
+    return await analysis_response(
+        request, request.sales,
+        profile=profile_mode(profile, x_ml_profile),
+        validation_seconds=received_seconds(http_request),
+        layout=layout, if_none_match=if_none_match
+    )
+
+@app.post("/api/ml/forecast")
+async def forecast_sales(request: ForecastRequest):
+    """Multi-day sales forecast with prediction intervals, in total or per product/customer"""
+    sales = SalesTable.of(request.sales)
+    if request.group_by == "total":
+        missing = await run_in_threadpool(missing_tenant_models, request.tenant_id, sales, None, ("sales_forecast",))
+        ensure_tenant_models(request.tenant_id, sales, None, missing)
+    try:
+        outputs = await analysis_executor.gather([(run_forecast, request, sales)])
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=f"ML service is busy: {e}", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Forecast exceeded {analysis_executor.timeout:g}s timeout")
+    if outputs[0] is None:
+        raise HTTPException(status_code=422, detail="Not enough sales history to forecast")
+    return {"success": True, "message": "Forecast generated", "forecast": outputs[0]}
+
+@app.post("/api/ml/analyze/upload", response_model=MLResponse)
+async def analyze_upload(
+    http_request: Request,
+    sales_file: UploadFile = File(...),
+    payload: Optional[str] = Form(None),
+    format: Optional[str] = Form(None),
+    profile: Optional[str] = None,
+    x_ml_profile: Optional[str] = Header(None),
+    layout: Literal["records", "columnar", "compact"] = "records",
+    if_none_match: Optional[str] = Header(None)
+):
+    """ML analysis with the sales history uploaded as an NDJSON or CSV file.
+    
+    `payload` is the rest of an MLRequest as JSON (inventory, loans, workers,
+    tenant_id). The file is parsed in chunks straight into columns, so large
+    histories never exist as one JSON document or a list of pydantic records.
+    """
+    try:
+        request = MLRequest.model_validate_json(payload) if payload else MLRequest()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if request.sales:
+        raise HTTPException(status_code=400, detail="Send sales as the uploaded file, not in payload")
+    
+    fmt = format or upload_format(sales_file.filename, sales_file.content_type)
+    try:
+        sales = await run_in_threadpool(read_sales_file, sales_file.file, fmt, max_rows=MAX_UPLOAD_ROWS)
+    except SalesUploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except SalesUploadError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        await sales_file.close()
+    
+    return await analysis_response(
+        request, sales, endpoint="upload",
+        profile=profile_mode(profile, x_ml_profile),
+        validation_seconds=received_seconds(http_request),
+        layout=layout, if_none_match=if_none_match
+    )
+
+async def analysis_response(request, sales, endpoint="analyze", profile=None, validation_seconds=0.0,
+                            layout="records", if_none_match=None):
+    """run_analysis as an HTTP response.
+    
+    Successful unprofiled responses carry the analysis ETag. If
+    ``if_none_match`` already names it, nothing is run and the answer is
+    304 Not Modified.
+    """
+    etag = None
+    
+    def unchanged(plan):
+        nonlocal etag
+        etag = analysis_etag(plan, layout)
+        return etag_matches(if_none_match, etag)
+    
+    response = await run_analysis(
+        request, sales, endpoint, profile, validation_seconds,
+        not_modified=None if profile else unchanged
+    )
+    if response is None:
+        return Response(status_code=304, headers=validator_headers(etag))
+    headers = validator_headers(etag) if etag and response.success else None
+    return FastJSONResponse(response, layout=layout, headers=headers)
+
+async def run_analysis(request, sales, endpoint="analyze", profile=None, validation_seconds=0.0,
+                       not_modified=None):
+    """Run every section a request needs, given its sales records or a SalesTable; returns an MLResponse.
+    
+    ``not_modified(plan)`` is asked before anything runs; if it returns
+    True, the client's copy is current and None is returned instead.
+    """
+    try:
+        started = time.perf_counter()
+        with timing() as timer:
+            # 1-4. Serve unchanged sections from cache, run the rest on the worker pool
+            with stage("cache_lookup"):
+                sales, plan, missing = await run_in_threadpool(prepare_analysis, request, sales)
+                if not_modified is not None and not_modified(plan):
+                    return None
+                ensure_tenant_models(request.tenant_id, sales, request.loans, missing)
+                results, pending = split_cached(plan)
+            cached_sections = list(results)
+            timed = await analysis_executor.gather(timed_calls(pending, profile)) if pending else []
+            response = finish_analysis(results, pending, [output for output, _, _ in timed])
+        
+        request_stages = dict(timer.totals, validation=validation_seconds)
+        section_timings = {key: stages for (key, _, _), (_, stages, _) in zip(pending, timed)}
+        total = validation_seconds + time.perf_counter() - started
+        record_analysis(endpoint, request, request_stages, section_timings, total)
+        
+        if profile:
+            response.ml_metrics["profile"] = {
+                "mode": profile,
+                "total_seconds": total,
+                "request_stages": request_stages,
+                "sections": section_timings,
+                "cached_sections": cached_sections,
+            }
+            if profile == "functions":
+                response.ml_metrics["profile"]["functions"] = {
+                    key: functions for (key, _, _), (_, _, functions) in zip(pending, timed)
+                }
+        return response
         
+    except ExecutorSaturated as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"ML service is busy: {e}",
+            headers={"Retry-After": "1"}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"ML analysis exceeded {analysis_executor.timeout:g}s timeout"
+        )
     except Exception as e:
-        return MLResponse(
-            success=False,
-            message=f"ML analysis failed: {str(e)}",
-            sales_forecast=None,
-            stock_predictions=None,
-            credit_risk=None,
-            operational_insights=None,
-            business_recommendations=[],
-            ml_metrics={"error": str(e)}
+        return failed_response(f"ML analysis failed: {str(e)}", str(e))
+
+async def analyze_batch_item(request):
+    """One tenant of a batch: all uncached sections run as a single pool task"""
+    started = time.perf_counter()
+    sales, plan, missing = await run_in_threadpool(prepare_analysis, request, request.sales)
+    ensure_tenant_models(request.tenant_id, sales, request.loans, missing)
+    results, pending = split_cached(plan)
+    timed = []
+    if pending:
+        async with batch_slots:
+            timed = await asyncio.wait_for(
+                batch_executor.run(run_sections, timed_calls(pending)),
+                batch_executor.timeout
+            )
+    response = finish_analysis(results, pending, [output for output, _, _ in timed])
+    section_timings = {key: stages for (key, _, _), (_, stages, _) in zip(pending, timed)}
+    record_analysis("batch", request, {}, section_timings, time.perf_counter() - started)
+    return response
+
+@app.post("/api/ml/analyze/batch", response_model=BatchResponse)
+async def analyze_batch(batch: BatchRequest, layout: Literal["records", "columnar", "compact"] = "records"):
+    """Analyze many mills in one call across a process pool.
+    
+    Workers are long-lived, so each keeps tenant models warm in its own model
+    cache across items and batches. A failing mill does not fail the batch;
+    it is reported in its own result entry.
+    """
+    if len(batch.requests) > batch_executor.max_queue:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(batch.requests)} requests (limit {batch_executor.max_queue})"
+        )
+    
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(analyze_batch_item(request) for request in batch.requests),
+        return_exceptions=True
+    )
+    
+    items = []
+    for index, (request, outcome) in enumerate(zip(batch.requests, outcomes)):
+        if isinstance(outcome, asyncio.TimeoutError):
+            outcome = failed_response(
+                f"ML analysis exceeded {batch_executor.timeout:g}s timeout", "timeout"
+            )
+        elif isinstance(outcome, Exception):
+            outcome = failed_response(f"ML analysis failed: {str(outcome)}", str(outcome))
+        items.append(BatchItem(index=index, tenant_id=request.tenant_id, response=outcome))
+    
+    failed = sum(1 for item in items if not item.response.success)
+    return FastJSONResponse(BatchResponse(
+        success=failed == 0,
+        message=f"Analyzed {len(items) - failed} of {len(items)} mills",
+        succeeded=len(items) - failed,
+        failed=failed,
+        elapsed_seconds=time.perf_counter() - started,
+        results=items
+    ), layout=layout)
+
+@app.post("/api/ml/models/train")
+async def train_stored_model(request: TrainRequest, wait: bool = False):
+    """Queue training of a tenant model as a new version.
+    
+    Returns 202 with the job (poll /api/ml/jobs/{job_id}); with `wait=true`
+    the response is held until the job finishes.
+    """
+    if request.model_type not in MODEL_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown model type: {request.model_type}")
+    sales = SalesTable.of(request.sales)
+    fingerprint = training_fingerprint(request.model_type, sales, request.loans)
+    try:
+        existing = model_store.find(request.tenant_id, request.model_type, fingerprint)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if existing:
+        return {"success": True, "message": "Model already trained on this data", "model": existing}
+    
+    job = schedule_training(
+        request.tenant_id, request.model_type, sales, request.loans,
+        priority=request.priority, promote=request.promote, fingerprint=fingerprint
+    )
+    if not wait:
+        return JSONResponse(
+            status_code=202,
+            content={"success": True, "message": "Training queued", "job": job.to_dict()}
         )
+    
+    await job.done.wait()
+    if job.status != "succeeded":
+        raise HTTPException(status_code=422, detail=job.error or f"Training job {job.status}")
+    return {"success": True, "message": "Model trained", "model": job.result, "job": job.to_dict()}
+
+@app.get("/api/ml/jobs")
+async def list_training_jobs(tenant_id: Optional[str] = None, status: Optional[str] = None):
+    """Training jobs, newest first"""
+    return {
+        "jobs": [job.to_dict() for job in training_scheduler.jobs(tenant_id, status)],
+        "scheduler": training_scheduler.stats()
+    }
+
+@app.get("/api/ml/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    job = training_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.delete("/api/ml/jobs/{job_id}")
+async def cancel_training_job(job_id: str):
+    """Cancel a job that has not started yet"""
+    job = training_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if not training_scheduler.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    return job.to_dict()
+
+# Incremental sales-forecast updates; a full refit runs every ML_FORECAST_REFIT_EVERY updates
+FORECAST_REFIT_EVERY = int(os.getenv("ML_FORECAST_REFIT_EVERY", "30"))
+forecast_locks = {}  # tenant_id -> [lock, holders and waiters]
+# Loads of a newer version an update is redone on before giving up with 409
+FORECAST_UPDATE_ATTEMPTS = 3
+
+@asynccontextmanager
+async def forecast_lock(tenant_id):
+    """Serialize one tenant's forecaster updates; the lock is dropped once nobody holds or awaits it"""
+    entry = forecast_locks.setdefault(tenant_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del forecast_locks[tenant_id]
+
+def load_forecaster(tenant_id):
+    """Active stored forecaster for a tenant (a private copy safe to modify)"""
+    try:
+        loaded = model_store.load(tenant_id, "sales_forecast")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="No stored sales forecast model; train one first")
+    artifact, meta = loaded
+    return SalesForecaster.from_artifact(artifact), meta
+
+def refit_forecaster(forecaster):
+    return forecaster if forecaster.refit() else None
+
+async def refit_sales_forecast(job):
+    """Training job: full refit of a tenant's incrementally updated forecaster"""
+    tenant_id = job.tenant_id
+    async with forecast_lock(tenant_id):
+        forecaster, meta = await run_in_threadpool(load_forecaster, tenant_id)
+        if forecaster.state is None or forecaster.state["updates_since_refit"] == 0:
+            return None
+        job.phase = "fitting"
+        refitted = await asyncio.wait_for(
+            training_executor.run(refit_forecaster, forecaster), training_executor.timeout
+        )
+        if refitted is not None:
+            job.phase = "saving"
+            # Fails if another worker saved an update meanwhile; its next update queues a new refit
+            await run_in_threadpool(
+                model_store.save, tenant_id, "sales_forecast", refitted.to_artifact(),
+                meta["fingerprint"], dict(refitted.metrics, refit=True), expected_active=meta["version"]
+            )
+            return load_model(tenant_id, "sales_forecast")
+        return None
+
+@app.post("/api/ml/models/{tenant_id}/sales_forecast/update")
+async def update_sales_forecast(tenant_id: str, request: SalesUpdateRequest):
+    """Append new sales to a tenant's forecaster without retraining on the full history.
+    
+    The lock serializes updates within this process. Across server processes
+    the save only succeeds if the version that was updated is still active,
+    and the update is otherwise redone on the newer version.
+    """
+    sales = SalesTable.of(request.sales)
+    async with forecast_lock(tenant_id):
+        for _ in range(FORECAST_UPDATE_ATTEMPTS):
+            forecaster, meta = await run_in_threadpool(load_forecaster, tenant_id)
+            try:
+                days = await run_in_threadpool(forecaster.update, sales)
+            except ValueError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            
+            # Each update is a new version whose identity chains onto the previous one
+            fingerprint = hashlib.sha256(
+                (meta["fingerprint"] + data_fingerprint(sales)).encode()
+            ).hexdigest()
+            try:
+                saved = await run_in_threadpool(
+                    model_store.save, tenant_id, "sales_forecast", forecaster.to_artifact(), fingerprint,
+                    forecaster.metrics, expected_active=meta["version"]
+                )
+                break
+            except VersionConflict:
+                continue
+        else:
+            raise HTTPException(status_code=409, detail="Model kept changing during the update; retry it")
+        load_model(tenant_id, "sales_forecast")
+    
+    refit_job = None
+    if forecaster.state["updates_since_refit"] >= FORECAST_REFIT_EVERY:
+        refit_job = training_scheduler.submit(tenant_id, "sales_forecast", refit_sales_forecast, kind="refit")
+    return {
+        "success": True, "days_updated": days, "model": saved,
+        "refit_job": refit_job.to_dict() if refit_job else None
+    }
+
+@app.get("/api/ml/models")
+async def list_stored_models():
+    """List every stored model with its versions"""
+    return {
+        "models": [
+            dict(model_store.versions(tenant_id, model_type), tenant_id=tenant_id, model_type=model_type)
+            for tenant_id, model_type in model_store.entries()
+        ]
+    }
+
+@app.get("/api/ml/models/{tenant_id}/{model_type}")
+async def get_stored_model(tenant_id: str, model_type: str):
+    """Version history of one tenant's model"""
+    try:
+        versions = model_store.versions(tenant_id, model_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not versions["versions"]:
+        raise HTTPException(status_code=404, detail="No stored model")
+    return dict(versions, tenant_id=tenant_id, model_type=model_type)
+
+@app.post("/api/ml/models/{tenant_id}/{model_type}/promote/{version}")
+async def promote_stored_model(tenant_id: str, model_type: str, version: int):
+    """Make a stored version the active one"""
+    if model_type not in MODEL_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown model type: {model_type}")
+    try:
+        model_store.promote(tenant_id, model_type, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return {"success": True, "active": load_model(tenant_id, model_type)}
+
+@app.post("/api/ml/models/{tenant_id}/{model_type}/rollback")
+async def rollback_stored_model(tenant_id: str, model_type: str):
+    """Re-activate the previously active version"""
+    if model_type not in MODEL_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown model type: {model_type}")
+    try:
+        model_store.rollback(tenant_id, model_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return {"success": True, "active": load_model(tenant_id, model_type)}
+
+# Server-side tenant history (ML_HISTORY_* env vars): clients push deltas and
+# analyze by tenant ID instead of resending every record
+history_store = HistoryStore(
+    os.getenv("ML_HISTORY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "history_store")),
+    max_segments=int(os.getenv("ML_HISTORY_MAX_SEGMENTS", "16")),
+    max_cached=int(os.getenv("ML_HISTORY_CACHED_TENANTS", "32"))
+)
+HISTORY_RECORD_TYPES = {"inventory": InventoryItem, "loans": LoanRecord, "workers": WorkerRecord}
+
+def require_history(tenant_id):
+    """404 unless the tenant has a stored history (a single stat, cheap enough for the event loop)"""
+    try:
+        exists = history_store.exists(tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not exists:
+        raise HTTPException(status_code=404, detail="No stored history for this tenant")
+
+def history_summary(tenant_id):
+    require_history(tenant_id)
+    try:
+        return history_store.summary(tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def stored_request(tenant_id, request_type):
+    """MLRequest over a tenant's stored inventory, loans and workers (sales are passed separately)"""
+    try:
+        selected_sections(request_type)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    records = history_store.records(tenant_id)
+    # Records were validated when they were pushed
+    return MLRequest.model_construct(
+        tenant_id=tenant_id,
+        request_type=request_type,
+        **{
+            kind: [model.model_construct(**record) for record in records[kind]]
+            for kind, model in HISTORY_RECORD_TYPES.items()
+        }
+    )
+
+@app.post("/api/ml/history/{tenant_id}")
+async def push_history(tenant_id: str, push: HistoryPush):
+    """Append new sales and upsert or remove inventory, loans and workers.
+    
+    Sales are append-only, so send only sales not pushed before (the
+    summary's `last_date` tells where the stored history ends). Inventory
+    items are keyed by product, loans by customer and loan date, workers by name.
+    Loans without a loan date cannot be matched, so they are always added;
+    remove the customer's loans to replace them. A push naming the same
+    record twice is rejected with 422.
+    """
+    changes = {kind: [record.model_dump() for record in getattr(push, kind)] for kind in RECORD_KEYS}
+    removals = {kind: getattr(push, f"remove_{kind}") for kind in RECORD_KEYS}
+    try:
+        # Records first: a rejected push must not leave its sales appended
+        if any(changes.values()) or any(removals.values()):
+            await run_in_threadpool(
+                history_store.upsert, tenant_id,
+                {kind: records for kind, records in changes.items() if records},
+                {kind: names for kind, names in removals.items() if names}
+            )
+        if push.sales:
+            await run_in_threadpool(history_store.append_sales, tenant_id, SalesTable.of(push.sales))
+    except DuplicateRecords as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "history": await run_in_threadpool(history_summary, tenant_id)}
+
+@app.post("/api/ml/history/{tenant_id}/sales/upload")
+async def upload_history_sales(tenant_id: str, sales_file: UploadFile = File(...), format: Optional[str] = Form(None)):
+    """Append an NDJSON or CSV sales file to a tenant's stored history (bulk import)"""
+    fmt = format or upload_format(sales_file.filename, sales_file.content_type)
+    try:
+        sales = await run_in_threadpool(read_sales_file, sales_file.file, fmt, max_rows=MAX_UPLOAD_ROWS)
+        await run_in_threadpool(history_store.append_sales, tenant_id, sales)
+    except SalesUploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except SalesUploadError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await sales_file.close()
+    return {"success": True, "history": await run_in_threadpool(history_summary, tenant_id)}
+
+@app.get("/api/ml/history/{tenant_id}")
+async def get_history(tenant_id: str):
+    """Row counts, date range and disk size of a tenant's stored history"""
+    return await run_in_threadpool(history_summary, tenant_id)
+
+@app.delete("/api/ml/history/{tenant_id}")
+async def delete_history(tenant_id: str):
+    try:
+        deleted = history_store.delete(tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="No stored history for this tenant")
+    return {"success": True}
+
+@app.post("/api/ml/history/{tenant_id}/analyze", response_model=MLResponse)
+async def analyze_history(
+    tenant_id: str,
+    http_request: Request,
+    request_type: str = "full_analysis",
+    profile: Optional[str] = None,
+    x_ml_profile: Optional[str] = Header(None),
+    layout: Literal["records", "columnar", "compact"] = "records",
+    if_none_match: Optional[str] = Header(None)
+):
+    """ML analysis of a tenant's stored history; the request carries no data"""
+    require_history(tenant_id)
+    started = time.perf_counter()
+    request = await run_in_threadpool(stored_request, tenant_id, request_type)
+    sales = await run_in_threadpool(history_store.sales, tenant_id)
+    return await analysis_response(
+        request, sales, endpoint="history",
+        profile=profile_mode(profile, x_ml_profile),
+        validation_seconds=received_seconds(http_request) + time.perf_counter() - started,
+        layout=layout, if_none_match=if_none_match
+    )
 
 def generate_recommendations(results):
     """Generate business recommendations based on ML results"""
@@ -588,12 +2103,30 @@ def calculate_ml_metrics(results):
     if results.get("credit_risk"):
         metrics["models_used"].append("credit_risk")
         metrics["total_predictions"] += len(results["credit_risk"])
+        metrics["credit_risk_methods"] = dict(Counter(c.get("method", "model") for c in results["credit_risk"]))
     
     if metrics["avg_confidence"] > 0:
         metrics["avg_confidence"] /= len([m for m in metrics["models_used"] if m == "sales_forecasting"])
     
     return metrics
 
+metrics_registry.gauges("executor", analysis_executor.stats)
+metrics_registry.gauges("batch_executor", batch_executor.stats)
+metrics_registry.gauges("inference_batching", inference_batcher.stats)
+metrics_registry.gauges("credit_engine", credit_engine.to_dict)
+metrics_registry.gauges("compression", compression_stats.stats)
+metrics_registry.gauges("model_cache", model_cache.stats)
+metrics_registry.gauges("result_cache", result_cache.stats)
+metrics_registry.gauges("training", training_scheduler.stats)
+metrics_registry.gauges("startup", lambda: startup)
+
+@app.get("/api/ml/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of latency histograms and component stats"""
+    return PlainTextResponse(
+        metrics_registry.expose(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/api/ml/health")
 async def health_check():
     """Health check endpoint"""
@@ -601,10 +2134,23 @@ async def health_check():
         "status": "healthy",
         "service": "Rice Mill ML Engine",
         "version": "2.0",
-        "models_ready": True,
+        "models_ready": startup["ready"],
+        "startup": startup,
+        "model_cache": model_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "executor": analysis_executor.stats(),
+        "training": training_scheduler.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/api/ml/ready")
+async def readiness_check():
+    """Readiness probe: 503 until stored models are loaded and workers are warm"""
+    body = dict(startup, status="ready" if startup["ready"] else "warming_up")
+    if not startup["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
 @app.get("/api/ml/info")
 async def get_model_info():
     """Get information about ML models"""
@@ -625,7 +2171,7 @@ async def get_model_info():
             {
                 "name": "Credit Risk Analyzer",
                 "type": "Supervised Classification",
-                "algorithm": "Random Forest Classifier",
+                "algorithm": credit_engine.name,
                 "purpose": "Assess credit default risk"
             },
             {
@@ -643,6 +2189,15 @@ async def get_model_info():
         ]
     }
 
+startup["import_seconds"] = time.perf_counter() - STARTED
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    host = os.getenv("ML_HOST", "0.0.0.0")
+    port = int(os.getenv("ML_PORT", "8000"))
+    workers = int(os.getenv("ML_WORKERS", "1"))
+    if workers > 1:
+        from serve import serve
+        serve(app, host, port, workers, preload=preload_models, on_worker_start=start_worker)
+    else:
+        import uvicorn
+        uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,231 @@
+# ml_service/metrics.py
+import contextvars
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels"""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _labels(self.labelnames + ("le",), key + (repr(float(bound)),))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _labels(self.labelnames + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Summary(Histogram):
+    """Sum and count only; cheap enough for high-cardinality labels such as tenants"""
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames, buckets=())
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} summary"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = _labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds metrics plus gauge sources (callables returning a stats dict)"""
+
+    def __init__(self, prefix="ml"):
+        self.prefix = prefix
+        self._metrics = []
+        self._gauge_sources = {}
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(f"{self.prefix}_{name}", help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def summary(self, name, help, labelnames=()):
+        metric = Summary(f"{self.prefix}_{name}", help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauges(self, component, source):
+        """Export every numeric value of ``source()`` as ml_<component>_<key>"""
+        self._gauge_sources[component] = source
+
+    def expose(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for component, source in self._gauge_sources.items():
+            for key, value in source().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    name = f"{self.prefix}_{component}_{key}"
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Self-time per named stage; an inner stage pauses the one around it"""
+
+    def __init__(self):
+        self.totals = {}
+        self._stack = []
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.totals[parent[0]] = self.totals.get(parent[0], 0.0) + now - parent[1]
+        self._stack.append([name, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        name, started = self._stack.pop()
+        self.totals[name] = self.totals.get(name, 0.0) + now - started
+        if self._stack:
+            self._stack[-1][1] = now
+
+
+_timer = contextvars.ContextVar("ml_stage_timer", default=None)
+
+
+@contextmanager
+def stage(name):
+    """Attribute the enclosed time to ``name`` if a StageTimer is active"""
+    timer = _timer.get()
+    if timer is None:
+        yield
+        return
+    timer.enter(name)
+    try:
+        yield
+    finally:
+        timer.exit()
+
+
+def staged(name):
+    """Decorator form of ``stage`` for methods that are a single stage"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def timing():
+    """Activate a fresh StageTimer for the enclosed block and yield it"""
+    timer = StageTimer()
+    token = _timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _timer.reset(token)
+
+
+def function_profile(profiler, limit=25):
+    """Top functions by cumulative time from a cProfile run"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename.rsplit('/', 1)[-1]}:{line}({func})",
+            "calls": calls,
+            "own_seconds": own,
+            "cumulative_seconds": cumulative,
+        })
+    rows.sort(key=lambda r: r["cumulative_seconds"], reverse=True)
+    return rows[:limit]
+
+
+def run_timed(section, profile, fn, *args):
+    """Run an analysis section, returning (output, stage seconds, function profile).
+
+    Timings travel back with the result, so this works the same on a thread
+    or a process pool. ``profile="functions"`` also runs the section under
+    cProfile and returns its top functions.
+    """
+    profiler = cProfile.Profile() if profile == "functions" else None
+    started = time.perf_counter()
+    with timing() as timer:
+        output = profiler.runcall(fn, *args) if profiler else fn(*args)
+    stages = dict(timer.totals, total=time.perf_counter() - started)
+    return output, stages, function_profile(profiler) if profiler else None
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route and status"""
+
+    def __init__(self, app, histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        scope.setdefault("state", {})["ml_started"] = started
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - started,
+                path=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
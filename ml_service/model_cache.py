@@ -0,0 +1,142 @@
+# ml_service/model_cache.py
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def estimate_size(value):
+    """Approximate in-memory size of a model by its pickled size"""
+    artifact = value.to_artifact() if hasattr(value, "to_artifact") else value
+    return len(pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class ModelCache:
+    """Thread-safe LRU cache of per-tenant models with a byte budget and TTL.
+
+    ``get_or_create`` is single-flight: when several threads miss on the same
+    key, only the first runs the (expensive) factory and the rest wait for its
+    result. Factories returning ``None`` are not cached.
+
+    Entries put with ``pinned=True`` never expire, are never evicted and do
+    not count against ``max_bytes``; they leave only through ``invalidate``
+    or a later ``put`` of the same key. Models preloaded before forking are
+    pinned so workers keep sharing the parent's copy.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=3600.0, sizer=estimate_size):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizer = sizer
+        self._entries = OrderedDict()  # key -> (value, size, loaded_at)
+        self._pinned = {}  # key -> (value, size)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._pinned_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, loaded_at):
+        return self.ttl is not None and time.monotonic() - loaded_at > self.ttl
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _unpin(self, key):
+        _, size = self._pinned.pop(key)
+        self._pinned_bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            pinned = self._pinned.get(key)
+            if pinned is not None:
+                return pinned[0]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[2]):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, pinned=False):
+        size = self.sizer(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if key in self._pinned:
+                self._unpin(key)
+            if pinned:
+                self._pinned[key] = (value, size)
+                self._pinned_bytes += size
+                return value
+            if size > self.max_bytes:
+                return value  # Too large to keep; caller still gets to use it
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if key in self._pinned:
+                self._unpin(key)
+
+    def get_or_create(self, key, factory):
+        """Return the cached value for ``key``, building it at most once on a miss"""
+        value = self.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = self._inflight[key] = Future()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.hits += 1
+
+        if not owner:
+            return waiter.result()
+
+        try:
+            value = factory()
+            if value is not None:
+                self.put(key, value)
+            waiter.set_result(value)
+            return value
+        except BaseException as e:
+            waiter.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "pinned": len(self._pinned),
+                "pinned_bytes": self._pinned_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "loading": len(self._inflight),
+            }
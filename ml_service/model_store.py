@@ -0,0 +1,220 @@
+# ml_service/model_store.py
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import joblib
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def data_fingerprint(*record_lists):
+    """Stable SHA-256 of the records a model was trained on"""
+    digest = hashlib.sha256()
+    for records in record_lists:
+        if hasattr(records, "fingerprint"):
+            # Columnar tables hash their arrays instead of per-record JSON
+            digest.update(records.fingerprint().encode())
+        else:
+            for record in records or []:
+                digest.update(json.dumps(record.model_dump(), sort_keys=True, default=str).encode())
+                digest.update(b"\n")
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+@contextmanager
+def directory_lock(directory, thread_lock):
+    """Hold ``thread_lock`` and an exclusive file lock on ``<directory>/.lock``"""
+    with thread_lock:
+        os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class VersionConflict(Exception):
+    """The active version changed between a caller's load and its save"""
+
+
+class ModelStore:
+    """Versioned on-disk registry of trained models.
+
+    Layout: ``<root>/<tenant>/<model_type>/v0001.joblib`` holds the artifact and
+    ``manifest.json`` next to it records every version's metadata (training-data
+    fingerprint, metrics, timestamp) plus which version is active. When
+    ``keep_versions`` is set, the oldest inactive versions beyond it are pruned.
+    Writes hold a file lock as well as a thread lock, so several server
+    processes can share one store.
+    """
+
+    def __init__(self, root, keep_versions=None):
+        self.root = root
+        self.keep_versions = keep_versions
+        self._lock = threading.Lock()
+
+    def _dir(self, tenant_id, model_type):
+        for name in (tenant_id, model_type):
+            if not SAFE_NAME.match(name or ""):
+                raise ValueError(f"Invalid model store key: {name!r}")
+        return os.path.join(self.root, tenant_id, model_type)
+
+    def _locked(self, directory):
+        return directory_lock(directory, self._lock)
+
+    def stamp(self, tenant_id, model_type):
+        """Manifest modification time; changes whenever a version is saved or activated"""
+        try:
+            return os.stat(os.path.join(self._dir(tenant_id, model_type), "manifest.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_manifest(self, directory):
+        path = os.path.join(directory, "manifest.json")
+        if not os.path.exists(path):
+            return {"active": None, "history": [], "versions": []}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, directory, manifest):
+        path = os.path.join(directory, "manifest.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    def save(self, tenant_id, model_type, artifact, fingerprint, metrics, promote=True, expected_active=None):
+        """Persist a new version and optionally make it the active one.
+
+        With ``expected_active``, the save is a compare-and-swap for
+        load-modify-save updates: it raises VersionConflict unless that
+        version is still the active one, e.g. because another server process
+        saved an update in between.
+        """
+        directory = self._dir(tenant_id, model_type)
+        with self._locked(directory):
+            manifest = self._read_manifest(directory)
+            if expected_active is not None and manifest["active"] != expected_active:
+                raise VersionConflict(
+                    f"{tenant_id}/{model_type} is at version {manifest['active']}, not {expected_active}"
+                )
+            version = max((v["version"] for v in manifest["versions"]), default=0) + 1
+            filename = f"v{version:04d}.joblib"
+            joblib.dump(artifact, os.path.join(directory, filename))
+            meta = {
+                "tenant_id": tenant_id,
+                "model_type": model_type,
+                "version": version,
+                "file": filename,
+                "fingerprint": fingerprint,
+                "metrics": metrics,
+                "created_at": datetime.now().isoformat(),
+            }
+            manifest["versions"].append(meta)
+            if promote:
+                self._activate(manifest, version)
+            self._prune(directory, manifest)
+            self._write_manifest(directory, manifest)
+        return dict(meta, active=manifest["active"] == version)
+
+    def _prune(self, directory, manifest):
+        excess = len(manifest["versions"]) - (self.keep_versions or len(manifest["versions"]))
+        if excess <= 0:
+            return
+        removable = [v for v in manifest["versions"] if v["version"] != manifest["active"]][:excess]
+        removed = {v["version"] for v in removable}
+        for meta in removable:
+            try:
+                os.remove(os.path.join(directory, meta["file"]))
+            except FileNotFoundError:
+                pass
+        manifest["versions"] = [v for v in manifest["versions"] if v["version"] not in removed]
+        manifest["history"] = [v for v in manifest["history"] if v not in removed]
+
+    def _activate(self, manifest, version):
+        if manifest["active"] is not None:
+            manifest["history"].append(manifest["active"])
+        manifest["active"] = version
+
+    def find(self, tenant_id, model_type, fingerprint):
+        """Return metadata of an existing version trained on identical data"""
+        manifest = self._read_manifest(self._dir(tenant_id, model_type))
+        for meta in manifest["versions"]:
+            if meta["fingerprint"] == fingerprint:
+                return meta
+        return None
+
+    def versions(self, tenant_id, model_type):
+        manifest = self._read_manifest(self._dir(tenant_id, model_type))
+        return {
+            "active": manifest["active"],
+            "versions": manifest["versions"],
+        }
+
+    def load(self, tenant_id, model_type, version=None):
+        """Load (artifact, metadata) for a version, defaulting to the active one"""
+        directory = self._dir(tenant_id, model_type)
+        manifest = self._read_manifest(directory)
+        version = version if version is not None else manifest["active"]
+        for meta in manifest["versions"]:
+            if meta["version"] == version:
+                return joblib.load(os.path.join(directory, meta["file"])), meta
+        return None
+
+    def promote(self, tenant_id, model_type, version):
+        directory = self._dir(tenant_id, model_type)
+        with self._locked(directory):
+            manifest = self._read_manifest(directory)
+            if not any(v["version"] == version for v in manifest["versions"]):
+                raise KeyError(f"{tenant_id}/{model_type} has no version {version}")
+            if manifest["active"] != version:
+                self._activate(manifest, version)
+                self._write_manifest(directory, manifest)
+        return version
+
+    def rollback(self, tenant_id, model_type):
+        """Re-activate the previously active version"""
+        directory = self._dir(tenant_id, model_type)
+        with self._locked(directory):
+            manifest = self._read_manifest(directory)
+            if not manifest["history"]:
+                raise KeyError(f"{tenant_id}/{model_type} has no earlier version to roll back to")
+            manifest["active"] = manifest["history"].pop()
+            self._write_manifest(directory, manifest)
+        return manifest["active"]
+
+    def entries(self):
+        """Yield (tenant_id, model_type) for every stored model"""
+        if not os.path.isdir(self.root):
+            return
+        for tenant_id in sorted(os.listdir(self.root)):
+            tenant_dir = os.path.join(self.root, tenant_id)
+            if not os.path.isdir(tenant_dir):
+                continue
+            for model_type in sorted(os.listdir(tenant_dir)):
+                if os.path.exists(os.path.join(tenant_dir, model_type, "manifest.json")):
+                    yield tenant_id, model_type
+
+    def load_active(self):
+        """Load every active model, keyed by (tenant_id, model_type)"""
+        loaded = {}
+        for tenant_id, model_type in self.entries():
+            result = self.load(tenant_id, model_type)
+            if result is not None:
+                loaded[(tenant_id, model_type)] = result
+        return loaded
@@ -0,0 +1,122 @@
+# ml_service/result_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from results import json_default, json_object_hook
+
+
+def section_key(section, *fingerprints):
+    """Cache key for one analysis section computed from its inputs' fingerprints"""
+    return hashlib.sha256("|".join((section,) + fingerprints).encode()).hexdigest()
+
+
+class ResultCache:
+    """LRU cache of analysis section results with TTL and optional disk tier.
+
+    Memory holds at most ``max_entries`` results. When ``disk_dir`` is set,
+    results are also written there as JSON so they survive restarts and are
+    shared between worker processes; disk entries expire by file mtime.
+    """
+
+    def __init__(self, max_entries=512, ttl=300.0, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from ML_RESULT_CACHE_* environment variables"""
+        return cls(
+            max_entries=int(os.getenv("ML_RESULT_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("ML_RESULT_CACHE_TTL", "300")),
+            disk_dir=os.getenv("ML_RESULT_CACHE_DIR") or None,
+        )
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".json")
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f, object_hook=json_object_hook)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, value):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(value, f, default=json_default)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            pass  # The disk tier is best effort
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.monotonic() - entry[1] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+        value = self._read_disk(key) if self.disk_dir else None
+        if value is not None:
+            self._remember(key, value)
+        with self._lock:
+            if value is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def put(self, key, value):
+        if value is None or self.max_entries <= 0:
+            return
+        self._remember(key, value)
+        if self.disk_dir:
+            self._write_disk(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_tier": bool(self.disk_dir),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
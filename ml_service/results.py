@@ -0,0 +1,151 @@
+# ml_service/results.py
+import json
+from datetime import date, datetime
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used instead
+    orjson = None
+
+# Wire formats of result tables: row dicts, column lists, or column lists
+# with repeated strings dictionary-encoded (see ResultTable.to_compact)
+LAYOUTS = ("records", "columnar", "compact")
+
+
+class ResultTable:
+    """Analyzer results held column-wise: one list or array per field.
+
+    Reads like a sequence of row dicts (len, indexing, iteration), so code
+    that consumes results row by row keeps working, but rows are only built
+    on demand. Serialization goes straight from the columns, either as rows
+    (the default wire format), as ``{field: [values...]}`` or in the compact
+    form of ``to_compact``.
+    """
+
+    __slots__ = ("columns", "_length")
+
+    def __init__(self, columns):
+        self.columns = {
+            name: values.tolist() if isinstance(values, np.ndarray) else list(values)
+            for name, values in columns.items()
+        }
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Result columns differ in length: {sorted(lengths)}")
+        self._length = lengths.pop() if lengths else 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        names = list(self.columns)
+        for row in zip(*self.columns.values()):
+            yield dict(zip(names, row))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ResultTable({name: values[index] for name, values in self.columns.items()})
+        return {name: values[index] for name, values in self.columns.items()}
+
+    def __eq__(self, other):
+        if isinstance(other, ResultTable):
+            return self.columns == other.columns
+        if isinstance(other, list):
+            return self.to_records() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ResultTable({self._length} rows, columns={list(self.columns)})"
+
+    def __getstate__(self):
+        return self.columns
+
+    def __setstate__(self, columns):
+        self.columns = columns
+        self._length = len(next(iter(columns.values()), []))
+
+    def column(self, name):
+        return self.columns[name]
+
+    def to_records(self):
+        return list(self)
+
+    def to_columns(self):
+        return self.columns
+
+    def to_compact(self):
+        """Columns, with string columns of few distinct values as ``{"dictionary": [...], "codes": [...]}``"""
+        compact = {}
+        for name, values in self.columns.items():
+            codes = {}
+            if self._length >= 8 and all(isinstance(v, str) for v in values):
+                for value in values:
+                    codes.setdefault(value, len(codes))
+                    if len(codes) > self._length // 4:
+                        break
+            if codes and len(codes) <= self._length // 4:
+                compact[name] = {"dictionary": list(codes), "codes": [codes[v] for v in values]}
+            else:
+                compact[name] = values
+        return compact
+
+
+def _encoder(layout):
+    def default(obj):
+        if isinstance(obj, ResultTable):
+            if layout == "compact":
+                return obj.to_compact()
+            return obj.to_columns() if layout == "columnar" else obj.to_records()
+        if isinstance(obj, BaseModel):
+            # Responses are built with model_construct; encode fields as they are
+            return {name: getattr(obj, name) for name in type(obj).model_fields}
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return default
+
+
+def dumps(content, layout="records"):
+    """Encode a response body to JSON bytes without an intermediate jsonable copy"""
+    if orjson is not None:
+        return orjson.dumps(
+            content, default=_encoder(layout),
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(content, default=_encoder(layout), separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded directly from models and result tables.
+
+    Returning it from an endpoint skips FastAPI's response-model validation
+    and jsonable_encoder pass, which otherwise copy every result row twice.
+    """
+
+    def __init__(self, content, layout="records", **kwargs):
+        self.layout = layout
+        super().__init__(content, **kwargs)
+
+    def render(self, content):
+        return dumps(content, self.layout)
+
+
+def json_default(obj):
+    """``json.dump`` hook storing result tables in a form ``json_object_hook`` restores"""
+    if isinstance(obj, ResultTable):
+        return {"__result_table__": obj.to_columns()}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_object_hook(obj):
+    if "__result_table__" in obj and len(obj) == 1:
+        return ResultTable(obj["__result_table__"])
+    return obj
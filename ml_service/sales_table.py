@@ -0,0 +1,241 @@
+# ml_service/sales_table.py
+import copy
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from customer_index import CustomerIndex
+from metrics import stage
+
+COLUMNS = ["date", "amount", "product", "quantity", "customer"]
+
+
+class SalesTable:
+    """Columnar, request-scoped view of sales records shared by all analyzers.
+
+    The DataFrame (parsed dates, float arrays, categorical product/customer)
+    is built lazily on first use and at most once, even when several analysis
+    sections ask for it concurrently. Pickling ships the columns rather than
+    the original pydantic records, so process-pool workers get it cheaply.
+    """
+
+    def __init__(self, records=None, frame=None):
+        self._records = records
+        self._frame = frame
+        self._daily_amount = None
+        self._customer_index = None
+        self._fingerprint = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def of(cls, sales):
+        """Wrap a list of SaleRecord, passing an existing table through"""
+        if isinstance(sales, cls):
+            return sales
+        return cls(records=sales or [])
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Adopt an already columnar frame (must have the COLUMNS layout)"""
+        return cls(frame=normalize_frame(frame))
+
+    def __len__(self):
+        if self._frame is not None:
+            return len(self._frame)
+        return len(self._records)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getstate__(self):
+        return {"frame": self.frame}
+
+    def __setstate__(self, state):
+        self.__init__(frame=state["frame"])
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    with stage("frame_build"):
+                        self._frame = build_frame(self._records)
+                    self._records = None
+        return self._frame
+
+    def daily_amount(self):
+        """Total sales amount per calendar day, gaps filled with zero"""
+        if self._daily_amount is None:
+            with self._lock:
+                if self._daily_amount is None:
+                    frame = self.frame
+                    with stage("frame_build"):
+                        series = frame.set_index("date")["amount"].sort_index()
+                        self._daily_amount = series.resample("D").sum().fillna(0)
+        return self._daily_amount
+
+    def customer_index(self):
+        """Per-customer purchase aggregates (built once, shared by every loan lookup)"""
+        if self._customer_index is None:
+            with self._lock:
+                if self._customer_index is None:
+                    frame = self.frame
+                    with stage("feature_prep"):
+                        self._customer_index = CustomerIndex.from_frame(frame)
+        return self._customer_index
+
+    def appended(self, frame):
+        """A new table with ``frame`` (COLUMNS layout, normalized) added after these rows.
+
+        An already built customer index is carried over and updated with just
+        the new rows instead of being rebuilt from the whole history.
+        """
+        table = SalesTable(frame=concat_frames([self.frame, frame]) if len(self) else frame)
+        if self._customer_index is not None:
+            table._customer_index = copy.deepcopy(self._customer_index).update(frame)
+        return table
+
+    def daily_matrix(self, by):
+        """Daily amount per ``by`` group (product or customer) over the full date range.
+
+        Returns (dates, group names, groups x days array); groups with no sales
+        and rows without a group are dropped.
+        """
+        frame = self.frame
+        with stage("frame_build"):
+            days = frame["date"].dt.normalize()
+            start = days.min()
+            offsets = (days - start).dt.days.to_numpy()
+            n_days = int(offsets.max()) + 1
+            codes = frame[by].cat.codes.to_numpy().astype(np.int64)
+            known = codes >= 0
+            groups = frame[by].cat.categories
+            # One bincount over (group, day) cells instead of a pivot
+            flat = np.bincount(
+                codes[known] * n_days + offsets[known],
+                weights=frame["amount"].to_numpy()[known],
+                minlength=len(groups) * n_days,
+            ).reshape(len(groups), n_days)
+            used = np.bincount(codes[known], minlength=len(groups)) > 0
+        return pd.date_range(start, periods=n_days, freq="D"), groups[used], flat[used]
+
+    def total_amount(self):
+        return float(self.frame["amount"].sum())
+
+    def fingerprint(self):
+        """Content hash of the columns, used as cache and training-data identity"""
+        if self._fingerprint is None:
+            frame = self.frame
+            with stage("fingerprint"):
+                digest = hashlib.sha256()
+                if len(frame):
+                    hashed = pd.util.hash_pandas_object(frame[COLUMNS], index=False)
+                    digest.update(hashed.to_numpy().tobytes())
+                self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+
+def build_frame(records):
+    """Build typed columns straight from SaleRecord attributes (no per-row dicts)"""
+    n = len(records)
+    return pd.DataFrame({
+        "date": pd.to_datetime([r.date for r in records]),
+        "amount": np.fromiter((r.amount for r in records), dtype=np.float64, count=n),
+        "product": pd.Categorical([r.product for r in records]),
+        "quantity": np.array([r.quantity for r in records], dtype=np.float64),
+        "customer": pd.Categorical([r.customer for r in records]),
+    })
+
+
+def normalize_frame(frame):
+    """Coerce an external frame to the dtypes build_frame produces"""
+    frame = frame.reindex(columns=COLUMNS)
+    return pd.DataFrame({
+        "date": pd.to_datetime(frame["date"]),
+        "amount": pd.to_numeric(frame["amount"]).astype(np.float64),
+        "product": frame["product"].astype("category"),
+        "quantity": pd.to_numeric(frame["quantity"]).astype(np.float64),
+        "customer": frame["customer"].astype("category"),
+    }).reset_index(drop=True)
+
+
+class SalesUploadError(ValueError):
+    """An uploaded sales file could not be parsed"""
+
+
+class SalesUploadTooLarge(SalesUploadError):
+    """An uploaded sales file has more rows than the service accepts"""
+
+
+UPLOAD_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def upload_format(filename=None, content_type=None):
+    """Guess ``csv`` or ``ndjson`` from an upload's file name or content type"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in UPLOAD_FORMATS:
+        return UPLOAD_FORMATS[ext]
+    if content_type and "csv" in content_type:
+        return "csv"
+    return "ndjson"
+
+
+def read_sales_file(fileobj, fmt="ndjson", chunk_rows=50_000, max_rows=None):
+    """Parse an NDJSON or CSV sales file chunk by chunk into a SalesTable.
+
+    Only one chunk of raw rows is held at a time; each is converted to typed
+    columns before the next is read, and categorical columns are merged at
+    the end, so peak memory stays close to the final columnar size.
+    """
+    if fmt == "csv":
+        reader = pd.read_csv(
+            fileobj, chunksize=chunk_rows, float_precision="round_trip",
+            dtype={"date": str, "product": str, "customer": str}
+        )
+    elif fmt == "ndjson":
+        text = io.TextIOWrapper(fileobj, encoding="utf-8") if not isinstance(fileobj, io.TextIOBase) else fileobj
+        reader = pd.read_json(
+            text, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False
+        )
+    else:
+        raise SalesUploadError(f"Unsupported sales file format: {fmt}")
+
+    chunks = []
+    rows = 0
+    try:
+        with reader:
+            for chunk in reader:
+                missing = {"date", "amount"} - set(chunk.columns)
+                if missing:
+                    raise SalesUploadError(f"Sales file is missing columns: {', '.join(sorted(missing))}")
+                rows += len(chunk)
+                if max_rows and rows > max_rows:
+                    raise SalesUploadTooLarge(f"Sales file has more than {max_rows} rows")
+                chunks.append(normalize_frame(chunk))
+    except SalesUploadError:
+        raise
+    except (ValueError, TypeError, pd.errors.ParserError) as e:
+        raise SalesUploadError(f"Invalid sales file near row {rows}: {e}") from e
+
+    if not chunks:
+        return SalesTable(records=[])
+    return SalesTable(frame=concat_frames(chunks))
+
+
+def concat_frames(chunks):
+    """Concatenate normalized chunks, merging categorical columns without object round-trips"""
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for name in COLUMNS:
+        parts = [chunk[name] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[name] = union_categoricals(parts)
+        else:
+            columns[name] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
@@ -0,0 +1,129 @@
+# ml_service/sampling.py
+"""Training-set reduction, so fitting time stays bounded as mills accumulate years of data.
+
+Credit models train on at most ``max_loans`` loans. The sample is stratified
+by risk label: each label keeps its share, and a rare label keeps at least
+``min_class_rows`` rows. Within a label, loans are drawn with a probability
+that halves every ``half_life_days`` of loan age.
+
+Sales models train on one sample per day. Every sample from the last
+``recent_days`` days is kept (the daily tier). Older samples are thinned to
+one in seven on average (the weekly tier), and thinned further if the total
+would exceed ``max_sales_samples``. Window features are still computed from
+the full daily series.
+
+Each reduced fit reports the rows it used, its fit time and its score on the
+full training set, so the accuracy-vs-cost trade-off is visible per model.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def decay_weights(ages, half_life_days):
+    """Sampling weight per row, halving every ``half_life_days`` of age"""
+    return np.power(0.5, np.asarray(ages, dtype=float) / half_life_days)
+
+
+def ages_in_days(dates):
+    """Age of each date string relative to the newest one (0 when missing or unparsable)"""
+    parsed = pd.to_datetime(pd.Series(dates, dtype=object), errors="coerce")
+    if parsed.isna().all():
+        return np.zeros(len(parsed))
+    return (parsed.max() - parsed).dt.days.fillna(0).to_numpy(dtype=float)
+
+
+def weighted_choice(weights, size, rng):
+    """Indices of ``size`` rows drawn without replacement with probability ∝ weight"""
+    # Efraimidis-Spirakis: keep the rows with the largest u ** (1 / w)
+    with np.errstate(divide="ignore"):
+        keys = np.log(rng.random(len(weights))) / np.maximum(weights, 1e-300)
+    return np.argpartition(-keys, size - 1)[:size] if size else np.empty(0, dtype=np.int64)
+
+
+def stratified_sample(labels, size, weights=None, min_per_class=0, rng=None):
+    """Row indices (sorted) of a label-stratified sample of ``size`` rows"""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    labels = np.asarray(labels)
+    weights = np.ones(len(labels)) if weights is None else np.asarray(weights, dtype=float)
+    classes, counts = np.unique(labels, return_counts=True)
+
+    quota = np.floor(counts / counts.sum() * size).astype(np.int64)
+    quota = np.minimum(np.maximum(quota, min(min_per_class, size // len(classes))), counts)
+    # Rounding and the per-class floor are settled against the largest class
+    quota[np.argmax(counts)] += size - quota.sum()
+
+    chosen = []
+    for label, take in zip(classes, quota):
+        rows = np.flatnonzero(labels == label)
+        chosen.append(rows[weighted_choice(weights[rows], int(take), rng)])
+    return np.sort(np.concatenate(chosen))
+
+
+class SamplingPolicy:
+    """Limits for training-set reduction; a limit of 0 disables that reduction"""
+
+    def __init__(self, max_loans=50_000, half_life_days=365.0, min_class_rows=500,
+                 recent_days=730, max_sales_samples=1_095, seed=0):
+        self.max_loans = max_loans
+        self.half_life_days = half_life_days
+        self.min_class_rows = min_class_rows
+        self.recent_days = recent_days
+        self.max_sales_samples = max_sales_samples
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_loans=int(os.getenv("ML_TRAIN_MAX_LOANS", "50000")),
+            half_life_days=float(os.getenv("ML_TRAIN_HALF_LIFE_DAYS", "365")),
+            min_class_rows=int(os.getenv("ML_TRAIN_MIN_CLASS_ROWS", "500")),
+            recent_days=int(os.getenv("ML_TRAIN_RECENT_DAYS", "730")),
+            max_sales_samples=int(os.getenv("ML_TRAIN_MAX_SALES_SAMPLES", "1095")),
+        )
+
+    def loan_rows(self, labels, dates=None):
+        """Indices of the loans to train on, or None to use them all"""
+        if not self.max_loans or len(labels) <= self.max_loans:
+            return None
+        weights = None
+        if dates is not None and self.half_life_days > 0:
+            weights = decay_weights(ages_in_days(dates), self.half_life_days)
+        return stratified_sample(
+            labels, self.max_loans, weights, self.min_class_rows, np.random.default_rng(self.seed)
+        )
+
+    def sales_rows(self, n_samples):
+        """Indices of the daily samples (oldest first) to train on, or None to use them all"""
+        recent = min(n_samples, self.recent_days) if self.recent_days else n_samples
+        old = n_samples - recent
+        keep_old = -(-old // 7)  # weekly tier
+        if self.max_sales_samples:
+            keep_old = min(keep_old, max(0, self.max_sales_samples - recent))
+        if keep_old >= old:
+            return None
+        rng = np.random.default_rng(self.seed)
+        old_rows = np.sort(rng.choice(old, size=keep_old, replace=False))
+        return np.concatenate([old_rows, np.arange(old, n_samples)])
+
+    def to_dict(self):
+        return {
+            "max_loans": self.max_loans,
+            "half_life_days": self.half_life_days,
+            "min_class_rows": self.min_class_rows,
+            "recent_days": self.recent_days,
+            "max_sales_samples": self.max_sales_samples,
+        }
+
+
+def sampling_report(strategy, rows_total, rows_used, fit_seconds, full_score):
+    """Metrics of a fit on a reduced training set"""
+    return {
+        "strategy": strategy,
+        "rows_total": int(rows_total),
+        "rows_used": int(rows_used),
+        "fraction": rows_used / rows_total if rows_total else 1.0,
+        "fit_seconds": fit_seconds,
+        "full_set_score": float(full_score),
+    }
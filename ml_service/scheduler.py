@@ -0,0 +1,203 @@
+# ml_service/scheduler.py
+import asyncio
+import heapq
+import itertools
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class TrainingJob:
+    """One queued or finished training job and its progress"""
+
+    def __init__(self, tenant_id, model_type, kind, runner, priority):
+        self.id = uuid.uuid4().hex
+        self.tenant_id = tenant_id
+        self.model_type = model_type
+        self.kind = kind
+        self.runner = runner
+        self.priority = priority
+        self.status = "queued"
+        self.phase = "queued"
+        self.result = None
+        self.error = None
+        self.submissions = 1
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self._started = None
+        self.duration_seconds = None
+        self.done = asyncio.Event()
+
+    @property
+    def key(self):
+        return (self.tenant_id, self.model_type, self.kind)
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "tenant_id": self.tenant_id,
+            "model_type": self.model_type,
+            "kind": self.kind,
+            "priority": next(name for name, rank in PRIORITIES.items() if rank == self.priority),
+            "status": self.status,
+            "phase": self.phase,
+            "submissions": self.submissions,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self.duration_seconds,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class TrainingScheduler:
+    """In-process queue that fits models off the request path.
+
+    Jobs are keyed by (tenant, model type, kind). Submitting a job whose key
+    is already queued replaces that job's runner with the newer one (latest
+    data wins) and keeps the higher priority, so bursts collapse into one fit.
+    At most ``max_concurrent`` jobs run at once, highest priority first, FIFO
+    within a priority. A runner is ``async def runner(job)``; it may update
+    ``job.phase`` and its return value becomes ``job.result``.
+    """
+
+    def __init__(self, max_concurrent=1, history=500):
+        self.max_concurrent = max_concurrent
+        self.history = history
+        self._jobs = OrderedDict()
+        self._queued = {}  # key -> queued job
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._workers = []
+        self._deduplicated = 0
+
+    def submit(self, tenant_id, model_type, runner, kind="train", priority="normal"):
+        """Queue a job, or fold it into an identical queued one. Returns the job."""
+        rank = PRIORITIES[priority]
+        job = self._queued.get((tenant_id, model_type, kind))
+        if job is not None:
+            job.runner = runner
+            job.submissions += 1
+            self._deduplicated += 1
+            if rank < job.priority:
+                job.priority = rank
+                heapq.heappush(self._heap, (rank, next(self._seq), job.id))
+            return job
+
+        job = TrainingJob(tenant_id, model_type, kind, runner, rank)
+        self._jobs[job.id] = job
+        self._queued[job.key] = job
+        heapq.heappush(self._heap, (rank, next(self._seq), job.id))
+        self._trim()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def active(self, tenant_id, model_type, kind="train"):
+        """The queued or running job for a key, if any"""
+        for job in reversed(self._jobs.values()):
+            if job.key == (tenant_id, model_type, kind) and not job.finished:
+                return job
+        return None
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, tenant_id=None, status=None):
+        return [
+            job for job in reversed(self._jobs.values())
+            if (tenant_id is None or job.tenant_id == tenant_id)
+            and (status is None or job.status == status)
+        ]
+
+    def cancel(self, job_id):
+        """Cancel a queued job; running jobs are left to finish"""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != "queued":
+            return False
+        self._queued.pop(job.key, None)
+        self._finish(job, "cancelled")
+        return True
+
+    def _finish(self, job, status):
+        job.status = job.phase = status
+        job.finished_at = datetime.now().isoformat()
+        if job._started is not None:
+            job.duration_seconds = time.perf_counter() - job._started
+        job.runner = None
+        job.done.set()
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond the history limit
+        excess = len(self._jobs) - self.history
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _next(self):
+        while self._heap:
+            _, _, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            # Skips cancelled jobs and stale heap entries left by a priority bump
+            if job is not None and job.status == "queued" and self._queued.get(job.key) is job:
+                del self._queued[job.key]
+                return job
+        return None
+
+    async def _work(self):
+        while True:
+            job = self._next()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job.status = job.phase = "running"
+            job.started_at = datetime.now().isoformat()
+            job._started = time.perf_counter()
+            try:
+                job.result = await job.runner(job)
+                self._finish(job, "succeeded")
+            except asyncio.CancelledError:
+                self._finish(job, "cancelled")
+                raise
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                self._finish(job, "failed")
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.max_concurrent)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._wakeup = None
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "max_concurrent": self.max_concurrent,
+            "queued_jobs": counts.get("queued", 0),
+            "running_jobs": counts.get("running", 0),
+            "succeeded_jobs": counts.get("succeeded", 0),
+            "failed_jobs": counts.get("failed", 0),
+            "cancelled_jobs": counts.get("cancelled", 0),
+            "deduplicated_submissions": self._deduplicated,
+        }
@@ -0,0 +1,155 @@
+# ml_service/serve.py
+"""Pre-fork multi-process serving.
+
+    ML_WORKERS=4 python main.py
+
+The parent process loads every stored model once, moves those objects out
+of the garbage collector's reach (``gc.freeze``) and forks the workers. The
+workers share the model memory copy-on-write and accept connections from
+one listening socket, so N workers do not mean N copies of every model.
+Crashed workers are replaced; SIGTERM/SIGINT stop them all. Each worker
+publishes its stats to a shared StatsBoard directory for aggregation.
+
+Unix only (relies on ``os.fork``).
+"""
+import gc
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+
+logger = logging.getLogger("ml_service.serve")
+
+
+class StatsBoard:
+    """Per-worker stats snapshots in a shared directory, aggregated on read"""
+
+    def __init__(self, directory, max_age=30.0):
+        self.directory = directory
+        self.max_age = max_age
+
+    def _path(self, worker):
+        return os.path.join(self.directory, f"worker-{worker}.json")
+
+    def publish(self, worker, stats):
+        path = self._path(worker)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(stats, worker=worker, pid=os.getpid(), updated_at=time.time()), f)
+        os.replace(tmp, path)
+
+    def remove(self, worker):
+        try:
+            os.remove(self._path(worker))
+        except FileNotFoundError:
+            pass
+
+    def collect(self):
+        """Snapshots of every live worker, keyed by worker id"""
+        snapshots = {}
+        now = time.time()
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("worker-") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if now - snapshot.get("updated_at", 0) <= self.max_age:
+                snapshots[str(snapshot["worker"])] = snapshot
+        return snapshots
+
+    @classmethod
+    def aggregate(cls, snapshots):
+        """Sum numeric values across snapshots, recursing into nested dicts"""
+        total = {}
+        for snapshot in snapshots:
+            for key, value in snapshot.items():
+                if key in ("worker", "pid", "updated_at") or isinstance(value, bool):
+                    continue
+                if isinstance(value, dict):
+                    total[key] = cls.aggregate([total.get(key, {}), value])
+                elif isinstance(value, (int, float)):
+                    total[key] = total.get(key, 0) + value
+        return total
+
+
+def serve(app, host="0.0.0.0", port=8000, workers=2, preload=None, on_worker_start=None,
+          log_level="info"):
+    """Run ``app`` on ``workers`` forked uvicorn processes sharing one socket.
+
+    ``preload()`` runs once in the parent before forking (load models here);
+    ``on_worker_start(index, board)`` runs in each worker right after the fork.
+    """
+    import uvicorn
+
+    if preload is not None:
+        preload()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    board = StatsBoard(tempfile.mkdtemp(prefix="ml-workers-"))
+
+    # Objects created so far are never collected, so GC passes in the
+    # workers do not write to (and un-share) the preloaded model pages
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                if on_worker_start is not None:
+                    on_worker_start(index, board)
+                server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+                server.run(sockets=[sock])
+            finally:
+                os._exit(0)
+        children[pid] = index
+        logger.info("Started worker %d (pid %d)", index, pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = children.pop(pid, None)
+            if index is None:
+                continue
+            board.remove(index)
+            if not stopping:
+                logger.warning("Worker %d (pid %d) exited with status %d; restarting", index, pid, status)
+                time.sleep(1)  # Avoid a tight restart loop if workers die on start
+                spawn(index)
+    finally:
+        sock.close()
+        shutil.rmtree(board.directory, ignore_errors=True)
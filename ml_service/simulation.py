@@ -0,0 +1,114 @@
+# ml_service/simulation.py
+"""Vectorized Monte Carlo stockout simulation for many SKUs at once.
+
+Demand is modelled as a Brownian motion with each SKU's daily mean and
+standard deviation, so the time until current stock runs out is inverse
+Gaussian (first passage) and demand over ``t`` days is normal with mean
+``mu * t`` and variance ``sigma ** 2 * t``. Supplier lead times are whole
+days drawn from a lognormal with the given mean and spread.
+
+Every chunk of SKUs is simulated as ``(SKUs, scenarios)`` float32 arrays,
+with chunks sized so one array holds about ``chunk_cells`` values, and each
+chunk draws from its own child of the seed (results are reproducible for a
+given seed and chunk size). Lead times are drawn once per scenario and
+shared by the SKUs of a chunk, which leaves each SKU's statistics unchanged.
+"""
+import math
+
+import numpy as np
+
+
+def lead_time_days(mean, std, size, rng):
+    """Whole-day lead times (at least one day) from a lognormal with this mean and std"""
+    if std <= 0:
+        return np.full(size, max(1.0, round(mean)), dtype=np.float32)
+    sigma2 = math.log1p((std / mean) ** 2)
+    days = np.exp(math.log(mean) - sigma2 / 2 + math.sqrt(sigma2) * rng.standard_normal(size, dtype=np.float32))
+    return np.maximum(np.rint(days), 1).astype(np.float32)
+
+
+def first_passage_days(stock, rate, std, size, rng):
+    """Days until demand exhausts ``stock``: (SKUs, size) inverse Gaussian samples.
+
+    Sampled with the Michael-Schucany-Haas transform. Items with no demand
+    variance run out at exactly ``stock / rate``; items without stock at 0.
+    """
+    stock = np.maximum(stock, 0).astype(np.float32)[:, None]
+    mean = (stock / rate.astype(np.float32)[:, None]).astype(np.float32)
+    with np.errstate(divide="ignore"):
+        shape = np.where(std[:, None] > 0, stock ** 2 / np.square(std, dtype=np.float32)[:, None], np.inf)
+    shape = shape.astype(np.float32)
+
+    # In place on two (SKUs, size) buffers: x = mean + mean / (2 shape) * (y - sqrt(y (4 shape + y))),
+    # for y = mean * z ** 2, then mean ** 2 / x instead of x with probability x / (mean + x)
+    y = rng.standard_normal((len(stock), size), dtype=np.float32)
+    np.square(y, out=y)
+    y *= mean
+    x = y + 4 * shape
+    x *= y
+    np.sqrt(x, out=x)
+    np.subtract(y, x, out=x)
+    with np.errstate(invalid="ignore"):
+        x *= mean / (2 * shape)
+    x += mean
+    deterministic = ~np.isfinite(shape[:, 0])
+    x[deterministic] = mean[deterministic]
+    np.maximum(x, np.float32(1e-6), out=x)
+
+    np.add(mean, x, out=y)
+    np.divide(mean, y, out=y)
+    keep = rng.random((len(stock), size), dtype=np.float32) <= y
+    np.divide(mean * mean, x, out=y)
+    np.copyto(y, x, where=keep)
+    y[stock[:, 0] <= 0] = 0
+    return y
+
+
+def simulate_stockouts(current_stock, daily_mean, daily_std, lead_time=5.0, lead_time_std=1.5,
+                       scenarios=10_000, service_level=0.95, review_days=7, seed=0,
+                       chunk_cells=2_000_000):
+    """Simulate ``scenarios`` demand and lead-time paths per SKU.
+
+    Returns per-SKU arrays: probability of running out before an order
+    placed now arrives, mean and 10th/50th/90th percentile days to empty,
+    the reorder point (``service_level`` quantile of lead-time demand) and
+    the order that covers lead time plus ``review_days`` at that service level.
+    """
+    current_stock = np.asarray(current_stock, dtype=np.float64)
+    rate = np.maximum(np.asarray(daily_mean, dtype=np.float64), 1e-9)
+    std = np.nan_to_num(np.asarray(daily_std, dtype=np.float64), nan=0.0)
+    n_items = len(current_stock)
+    rows = max(1, chunk_cells // scenarios)
+    n_chunks = -(-n_items // rows)
+    children = np.random.SeedSequence(seed).spawn(n_chunks)
+
+    result = {name: np.empty(n_items) for name in (
+        "stockout_probability", "days_to_empty_mean", "days_to_empty_p10", "days_to_empty_p50",
+        "days_to_empty_p90", "reorder_point", "service_level_order",
+    )}
+    ranks = [min(scenarios - 1, int(q * scenarios)) for q in (0.1, 0.5, 0.9, service_level)]
+
+    for chunk, child in zip(range(0, n_items, rows), children):
+        block = slice(chunk, chunk + rows)
+        rng = np.random.default_rng(child)
+        lead = lead_time_days(lead_time, lead_time_std, scenarios, rng)
+        days = first_passage_days(current_stock[block], rate[block], std[block], scenarios, rng)
+
+        result["stockout_probability"][block] = (days < lead).mean(axis=1)
+        result["days_to_empty_mean"][block] = days.mean(axis=1, dtype=np.float64)
+        days.partition(ranks[:3], axis=1)
+        for name, rank in zip(("p10", "p50", "p90"), ranks[:3]):
+            result[f"days_to_empty_{name}"][block] = days[:, rank]
+        del days
+
+        # Demand over the lead time (reorder point) and over lead time plus review
+        # period (order-up-to level), from one set of standard normal draws
+        noise = rng.standard_normal((len(rate[block]), scenarios), dtype=np.float32)
+        mu, sigma = rate[block, None].astype(np.float32), std[block, None].astype(np.float32)
+        for name, horizon in (("reorder_point", lead), ("service_level_order", lead + review_days)):
+            demand = mu * horizon + sigma * np.sqrt(horizon) * noise
+            demand.partition(ranks[3], axis=1)
+            result[name][block] = np.maximum(demand[:, ranks[3]], 0)
+
+    result["service_level_order"] = np.maximum(result["service_level_order"] - np.maximum(current_stock, 0), 0)
+    return result
@@ -0,0 +1,157 @@
+# ml_service/synthetic.py
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+VARIETIES = {
+    # variety: base price per kg (Rs.)
+    "Samba": 230, "Keeri Samba": 310, "Nadu": 190, "Red Raw": 200, "White Raw": 185,
+    "Suduru Samba": 420, "Kekulu": 175, "Red Nadu": 205, "Basmati": 650, "Paddy": 110,
+}
+PACK_SIZES = [1, 5, 10, 25, 50]
+SKILLS = ["low", "medium", "high", "expert"]
+
+# Preset workload sizes for benchmarks
+SCALES = {
+    "tiny": dict(sales=200, skus=10, customers=20, loans=12, workers=5, days=90),
+    "small": dict(sales=1_000, skus=10, customers=50, loans=20, workers=10, days=365),
+    "medium": dict(sales=100_000, skus=1_000, customers=2_000, loans=500, workers=50, days=730),
+    "large": dict(sales=1_000_000, skus=10_000, customers=20_000, loans=5_000, workers=200, days=1095),
+}
+
+
+def sku_catalog(n_skus):
+    """SKU names with their pack size (kg) and price per kg"""
+    names, packs, prices = [], [], []
+    i = 0
+    while len(names) < n_skus:
+        for variety, price in VARIETIES.items():
+            for pack in PACK_SIZES:
+                if len(names) == n_skus:
+                    break
+                suffix = f" #{i}" if i else ""
+                names.append(f"{variety} {pack}kg{suffix}")
+                packs.append(pack)
+                prices.append(price * (1 + 0.02 * i))
+        i += 1
+    return names, np.array(packs, dtype=float), np.array(prices, dtype=float)
+
+
+def _day_weights(days, end):
+    """Daily demand shape: quieter Sundays, peaks after the Maha and Yala harvests"""
+    dates = pd.date_range(end=end, periods=days, freq="D")
+    weekly = np.where(dates.dayofweek == 6, 0.4, 1.0)
+    month = dates.month.to_numpy()
+    seasonal = 1 + 0.35 * np.isin(month, [2, 3]) + 0.25 * np.isin(month, [8, 9])
+    weights = weekly * seasonal
+    return dates, weights / weights.sum()
+
+
+def sales_frame(n_sales, n_skus, n_customers, days, rng, end=date(2025, 12, 31)):
+    """Synthetic sales history as a frame with the SalesTable columns"""
+    dates, day_p = _day_weights(days, end)
+    names, packs, prices = sku_catalog(n_skus)
+
+    # Zipf-like popularity for products and customers
+    sku_p = 1 / np.arange(1, n_skus + 1)
+    sku_p /= sku_p.sum()
+    customer_p = 1 / np.sqrt(np.arange(1, n_customers + 1))
+    customer_p /= customer_p.sum()
+
+    day_idx = np.sort(rng.choice(days, size=n_sales, p=day_p))
+    sku_idx = rng.choice(n_skus, size=n_sales, p=sku_p)
+    customer_idx = rng.choice(n_customers, size=n_sales, p=customer_p)
+    # The busiest tenth of customers are wholesale buyers with larger orders
+    units = rng.integers(1, 12, size=n_sales) * np.where(customer_idx < n_customers // 10, 8, 1)
+    quantity = units * packs[sku_idx]
+    amount = quantity * prices[sku_idx] * rng.normal(1.0, 0.05, size=n_sales)
+
+    return pd.DataFrame({
+        "date": dates[day_idx],
+        "amount": amount.round(2),
+        "product": pd.Categorical.from_codes(sku_idx, categories=names),
+        "quantity": quantity,
+        "customer": pd.Categorical.from_codes(
+            customer_idx, categories=[f"CUST-{i:05d}" for i in range(n_customers)]
+        ),
+    })
+
+
+def inventory_records(n_skus, rng):
+    names, packs, _ = sku_catalog(n_skus)
+    stock = rng.gamma(2.0, 400.0, size=n_skus) * packs
+    records = []
+    for i, name in enumerate(names):
+        record = {"product": name, "currentStock": float(round(stock[i], 1)), "category": "rice"}
+        if i % 4 == 0:
+            record["dailyConsumption"] = float(round(rng.uniform(5, 80) * packs[i], 1))
+        if i % 3 == 0:
+            record["reorderLevel"] = float(round(stock[i] * rng.uniform(0.2, 0.8), 1))
+        records.append(record)
+    return records
+
+
+def loan_records(n_loans, n_customers, rng):
+    customers = rng.choice(n_customers, size=min(n_loans, n_customers), replace=False)
+    customers = np.resize(customers, n_loans)
+    overdue = rng.exponential(15, size=n_loans).astype(int)
+    defaults = rng.poisson(0.15, size=n_loans)
+    kinds = rng.choice(["retail", "wholesale", "new"], size=n_loans, p=[0.6, 0.3, 0.1])
+    return [
+        {
+            "customer": f"CUST-{customers[i]:05d}",
+            "outstandingAmount": float(round(rng.lognormal(10, 0.9), 2)),
+            "overdueDays": int(overdue[i]),
+            "pastDefaults": int(defaults[i]),
+            "customerType": str(kinds[i]),
+        }
+        for i in range(n_loans)
+    ]
+
+
+def worker_records(n_workers, rng):
+    skills = rng.choice(SKILLS, size=n_workers, p=[0.3, 0.4, 0.2, 0.1])
+    return [
+        {
+            "name": f"Worker {i}",
+            "dailyWage": float(round(rng.uniform(1500, 4000), 0)),
+            "attendance": float(round(rng.uniform(0.7, 1.0), 2)),
+            "skillLevel": str(skills[i]),
+        }
+        for i in range(n_workers)
+    ]
+
+
+def sales_records(frame):
+    """SaleRecord-shaped dicts (as a client would post them) from a sales frame"""
+    records = frame.assign(
+        date=frame["date"].dt.strftime("%Y-%m-%d"),
+        product=frame["product"].astype(str),
+        customer=frame["customer"].astype(str),
+    )
+    return records.to_dict("records")
+
+
+def workload(scale="small", seed=42, **overrides):
+    """Synthetic rice-mill dataset: sales frame plus inventory, loan and worker records"""
+    params = dict(SCALES[scale], **{k: v for k, v in overrides.items() if v is not None})
+    rng = np.random.default_rng(seed)
+    frame = sales_frame(params["sales"], params["skus"], params["customers"], params["days"], rng)
+    return {
+        "params": params,
+        "sales_frame": frame,
+        "inventory": inventory_records(params["skus"], rng),
+        "loans": loan_records(params["loans"], params["customers"], rng),
+        "workers": worker_records(params["workers"], rng),
+    }
+
+
+def ml_request_payload(data):
+    """JSON body for /api/ml/analyze from a workload"""
+    return {
+        "sales": sales_records(data["sales_frame"]),
+        "inventory": data["inventory"],
+        "loans": data["loans"],
+        "workers": data["workers"],
+    }
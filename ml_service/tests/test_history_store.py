@@ -0,0 +1,31 @@
+# ml_service/tests/test_history_store.py
+import pytest
+
+from history_store import DuplicateRecords, HistoryStore
+
+
+def loan(customer, amount, loan_date=None):
+    return {"customer": customer, "outstandingAmount": amount, "loanDate": loan_date}
+
+
+def test_undated_loans_are_all_kept(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    loans = [loan(f"c{i % 5}", 100.0 + i) for i in range(15)]
+    assert store.upsert("mill", {"loans": loans})["loans"] == 15
+    assert store.upsert("mill", {"loans": [loan("c0", 1.0)]})["loans"] == 16
+    stored = sorted(record["outstandingAmount"] for record in store.records("mill")["loans"])
+    assert stored == sorted([1.0] + [100.0 + i for i in range(15)])
+
+
+def test_dated_loans_are_replaced_by_key(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.upsert("mill", {"loans": [loan("c0", 100.0, "2025-01-01"), loan("c0", 200.0, "2025-02-01")]})
+    assert store.upsert("mill", {"loans": [loan("c0", 50.0, "2025-01-01")]})["loans"] == 2
+    assert store.upsert("mill", {}, {"loans": ["c0"]})["loans"] == 0
+
+
+def test_duplicate_keys_in_one_push_are_rejected(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    with pytest.raises(DuplicateRecords):
+        store.upsert("mill", {"loans": [loan("c0", 100.0, "2025-01-01"), loan("c0", 200.0, "2025-01-01")]})
+    assert store.records("mill")["loans"] == []
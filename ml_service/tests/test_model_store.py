@@ -0,0 +1,15 @@
+# ml_service/tests/test_model_store.py
+import pytest
+
+from model_store import ModelStore, VersionConflict
+
+
+def test_save_with_expected_active_detects_a_concurrent_save(tmp_path):
+    store = ModelStore(str(tmp_path))
+    first = store.save("mill", "sales_forecast", {"v": 1}, "a", {})
+    # Two writers both loaded version 1; the second save must not silently win
+    store.save("mill", "sales_forecast", {"v": 2}, "b", {}, expected_active=first["version"])
+    with pytest.raises(VersionConflict):
+        store.save("mill", "sales_forecast", {"v": 3}, "c", {}, expected_active=first["version"])
+    artifact, meta = store.load("mill", "sales_forecast")
+    assert artifact == {"v": 2} and meta["version"] == 2
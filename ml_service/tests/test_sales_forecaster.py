@@ -0,0 +1,44 @@
+# ml_service/tests/test_sales_forecaster.py
+import copy
+
+import numpy as np
+import pandas as pd
+
+from main import SalesForecaster, SaleRecord
+
+
+def sales(start, days, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq="D")
+    return [
+        SaleRecord(date=date.strftime("%Y-%m-%d"), amount=float(amount))
+        for date, amount in zip(dates, rng.uniform(50, 150, days))
+    ]
+
+
+def assert_same_fit(updated, refitted):
+    np.testing.assert_allclose(updated.linear_form()[0], refitted.linear_form()[0], rtol=1e-6, atol=1e-8)
+    assert abs(updated.linear_form()[1] - refitted.linear_form()[1]) < 1e-6
+    assert updated.metrics["samples"] == refitted.metrics["samples"]
+
+
+def check_update(history, new_sales):
+    forecaster = SalesForecaster()
+    assert forecaster.train(history)
+    forecaster.update(new_sales)
+    refitted = copy.deepcopy(forecaster)
+    assert refitted.refit()
+    assert_same_fit(forecaster, refitted)
+
+
+def test_update_matches_refit_for_contiguous_days():
+    check_update(sales("2025-01-01", 120, seed=1), sales("2025-05-01", 30, seed=2))
+
+
+def test_update_matches_refit_after_a_gap():
+    # The skipped days are zero-filled; windows ending on them must be counted too
+    check_update(sales("2025-01-01", 120, seed=1), sales("2025-05-10", 30, seed=2))
+
+
+def test_update_matches_refit_when_revising_old_days():
+    check_update(sales("2025-01-01", 120, seed=1), sales("2025-03-01", 5, seed=3))
@@ -0,0 +1,33 @@
+# ml_service/tests/test_stock_risk.py
+from main import InventoryItem, SaleRecord, StockRiskPredictor
+
+
+def daily_sales(product, quantities):
+    return [
+        SaleRecord(date=f"2025-01-{day:02d}", amount=1.0, product=product, quantity=quantity)
+        for day, quantity in enumerate(quantities, start=1)
+    ]
+
+
+def risk(sales, inventory):
+    predictor = StockRiskPredictor()
+    patterns = predictor.calculate_consumption_pattern(sales, inventory)
+    return patterns, {row["product"]: row for row in predictor.predict_stock_risk(inventory, patterns).to_records()}
+
+
+def test_recent_surge_raises_consumption_and_risk():
+    sales = daily_sales("A", [10] * 24 + [40] * 7)
+    inventory = [InventoryItem(product="A", currentStock=150)]
+    patterns, rows = risk(sales, inventory)
+    assert patterns.loc["A", "recent_mean"] == 40
+    assert patterns.loc["A", "daily_mean"] < 20
+    assert rows["A"]["daily_consumption"] == 40
+    assert rows["A"]["risk_level"] == "CRITICAL"
+
+
+def test_long_run_mean_is_kept_when_recent_sales_drop():
+    sales = daily_sales("A", [10] * 24 + [0] * 7) + daily_sales("B", [5] * 31)
+    inventory = [InventoryItem(product="A", currentStock=150)]
+    patterns, rows = risk(sales, inventory)
+    assert patterns.loc["A", "recent_mean"] == 0
+    assert rows["A"]["daily_consumption"] == patterns.loc["A", "daily_mean"]